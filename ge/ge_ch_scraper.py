@@ -8,34 +8,101 @@ import builtins
 import csv
 import json
 import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from html import unescape
+from operator import itemgetter
 from pathlib import Path
 from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
 from xml.etree import ElementTree as ET
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as FastHTMLParser
+except ImportError:
+    FastHTMLParser = None
 
 BASE_URL = "https://www.ge.ch"
 LIST_URL = f"{BASE_URL}/offres-emploi-etat-geneve/liste-offres"
 RSS_URL = f"{BASE_URL}/rss/offres-emploi-etat-geneve"
+_DETAIL_PREFIX = f"{LIST_URL}/"
 DEFAULT_HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
         "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
     ),
     "Accept-Language": "fr-CH,fr;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
 }
 
+_TAG_RE = re.compile(r"<[^>]+>")
+_DETAIL_PATH_RE = re.compile(r"/offres-emploi-etat-geneve/liste-offres/\d+$")
+_DEPT_HREF_RE = re.compile(r"/(organisation|justice\.ge\.ch)")
+_TAUX_RE = re.compile(
+    r"Taux d.?activit[eé]\s*([\d\s%a-zA-Z.,\-]+?)(?:R[ée]mun[ée]ration|Classe|$)",
+    re.IGNORECASE,
+)
+# Campos Drupal do cartao; quando nenhum existe volta-se ao texto completo do <li>.
+_CARD_FIELDS_SELECTOR = (
+    '[class*="field--name-field-taux"], '
+    '[class*="field--name-field-remuneration"], '
+    '[class*="field--name-field-classe"]'
+)
+_CLASSE_RE = re.compile(r"classe\s*(\d+)", re.IGNORECASE)
+_REM_RE = re.compile(r"R[ée]mun[ée]ration\s*([^|]+)", re.IGNORECASE)
+# Um grupo nomeado por rotulo, pela ordem de prioridade: vence o primeiro rotulo (nesta
+# ordem) cuja primeira ocorrencia tem data valida, e nao a ocorrencia mais cedo no texto.
+_POST_DATE_RE = re.compile(
+    r"(?:(?P<publie_le>publi[eé]\s*le)|(?P<mise_en_ligne>mise en ligne))"
+    r"[^\d]*(?P<date>\d{1,2}[./]\d{1,2}[./]\d{2,4})",
+    re.IGNORECASE,
+)
+_DEADLINE_RE = re.compile(
+    r"(?:(?P<date_limite>date limite)|(?P<delai>d[ée]lai de candidature)|(?P<avant_le>avant le))"
+    r"[^\d]*(?P<date>\d{1,2}[./]\d{1,2}[./]\d{2,4})",
+    re.IGNORECASE,
+)
+# fetch_detail so le <main>/<article>, <h1> e <p>: o resto da pagina nem entra na arvore.
+# Sem <main> nem <article> a pagina e relida inteira, para o texto das datas nao se perder.
+_DETAIL_STRAINER = SoupStrainer(["main", "article", "h1", "p"])
+_JSON_EXT_RE = re.compile(r"\.json$", re.IGNORECASE)
+
 
 def print(*args, **kwargs):  # type: ignore[override]
     kwargs.setdefault("flush", True)
     return builtins.print(*args, **kwargs)
 
 
+def build_session(pool_size: int = 16) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def build_search_url(domaine: int | None = None, page: int = 1) -> str:
     params: dict[str, str] = {}
     if domaine is not None:
@@ -57,75 +124,166 @@ def set_page_param(url: str, page: int) -> str:
 
 
 def _is_job_detail_url(url: str) -> bool:
+    # Caminho rapido: o caso comum (mesmo host, so o id numerico) dispensa o urlparse.
+    # Qualquer outra coisa (query, fragmento, barra final...) segue pela verificacao completa.
+    if url.startswith(_DETAIL_PREFIX) and url[len(_DETAIL_PREFIX) :].isdecimal():
+        return True
     try:
         parsed = urlparse(url)
     except Exception:
         return False
     return bool(
         parsed.netloc.lower().endswith("ge.ch")
-        and re.search(r"/offres-emploi-etat-geneve/liste-offres/\d+$", parsed.path)
+        and _DETAIL_PATH_RE.search(parsed.path)
     )
 
 
 def _clean_text(value: str | None, limit: int = 1600) -> str | None:
     if not value:
         return None
-    value = unescape(value)
-    value = re.sub(r"\s+", " ", value).strip()
+    # str.split() sem argumentos colapsa qualquer whitespace (incl. unicode) e faz strip.
+    value = " ".join(unescape(value).split())
     if not value:
         return None
     return value[:limit]
 
 
+def _match_taux(text: str) -> str | None:
+    taux_match = _TAUX_RE.search(text)
+    return _clean_text(taux_match.group(1), 120) if taux_match else None
+
+
+def _match_remuneration(text: str) -> str | None:
+    classe_match = _CLASSE_RE.search(text)
+    if classe_match:
+        return f"classe {classe_match.group(1)}"
+    rem_match = _REM_RE.search(text)
+    return _clean_text(rem_match.group(1), 120) if rem_match else None
+
+
+def _parse_card_text(title: str, departement: str | None, li_text: str, full_text=None) -> dict:
+    """
+    `li_text` pode ser so o texto dos campos Drupal; `full_text` (callable) devolve o texto
+    completo do <li> e so e chamado quando um dos regexes falha nos campos.
+    """
+    taux = _match_taux(li_text)
+    remuneration = _match_remuneration(li_text)
+    if full_text is not None and (taux is None or remuneration is None):
+        # Os rotulos podem estar fora dos campos selecionados: volta-se ao <li> inteiro.
+        text = full_text()
+        if taux is None:
+            taux = _match_taux(text)
+        if remuneration is None:
+            remuneration = _match_remuneration(text)
+
+    return {
+        "title": title or None,
+        "departement": departement,
+        "taux": taux,
+        "remuneration": remuneration,
+    }
+
+
 def _parse_li_card(li: BeautifulSoup) -> dict:
     title = ""
     departement = None
-    taux = None
-    remuneration = None
 
     link = li.find("a", href=True)
     if link:
         title = _clean_text(link.get_text(" ", strip=True), 240) or ""
 
-    dept_links = li.find_all("a", href=re.compile(r"/(organisation|justice\.ge\.ch)"))
+    dept_links = li.find_all("a", href=_DEPT_HREF_RE)
     if dept_links:
         departement = _clean_text(dept_links[0].get_text(" ", strip=True), 160)
 
-    li_text = li.get_text(separator=" ", strip=True)
-    taux_match = re.search(
-        r"Taux d.?activit[eé]\s*([\d\s%a-zA-Z.,\-]+?)(?:R[ée]mun[ée]ration|Classe|$)",
-        li_text,
-        flags=re.IGNORECASE,
-    )
-    if taux_match:
-        taux = _clean_text(taux_match.group(1), 120)
+    fields = li.select(_CARD_FIELDS_SELECTOR)
+    if fields:
+        li_text = " ".join(f.get_text(separator=" ", strip=True) for f in fields)
+        return _parse_card_text(
+            title, departement, li_text, full_text=lambda: li.get_text(separator=" ", strip=True)
+        )
+    return _parse_card_text(title, departement, li.get_text(separator=" ", strip=True))
 
-    classe_match = re.search(r"classe\s*(\d+)", li_text, flags=re.IGNORECASE)
-    if classe_match:
-        remuneration = f"classe {classe_match.group(1)}"
-    else:
-        rem_match = re.search(r"R[ée]mun[ée]ration\s*([^|]+)", li_text, flags=re.IGNORECASE)
-        if rem_match:
-            remuneration = _clean_text(rem_match.group(1), 120)
 
-    return {
-        "title": title or None,
-        "departement": departement,
-        "taux": taux,
-        "remuneration": remuneration,
-    }
+def _parse_li_node(li) -> dict:
+    """Equivalente a _parse_li_card para um no selectolax."""
+    title = ""
+    departement = None
 
+    link = li.css_first("a[href]")
+    if link is not None:
+        title = _clean_text(link.text(separator=" ", strip=True), 240) or ""
 
-def extract_detail_links(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    for a in li.css("a[href]"):
+        if _DEPT_HREF_RE.search(a.attributes.get("href") or ""):
+            departement = _clean_text(a.text(separator=" ", strip=True), 160)
+            break
+
+    fields = li.css(_CARD_FIELDS_SELECTOR)
+    if fields:
+        li_text = " ".join(f.text(separator=" ", strip=True) for f in fields)
+        return _parse_card_text(title, departement, li_text, full_text=lambda: li.text(separator=" ", strip=True))
+    return _parse_card_text(title, departement, li.text(separator=" ", strip=True))
+
+
+def _extract_detail_links_fast(html: str | bytes) -> list[dict]:
+    tree = FastHTMLParser(html)
     out: list[dict] = []
     seen: set[str] = set()
-    pattern = re.compile(r"/offres-emploi-etat-geneve/liste-offres/\d+$")
 
-    for li in soup.select("li"):
-        link = li.find("a", href=pattern)
-        if not link:
+    for link in tree.css('a[href*="/offres-emploi-etat-geneve/liste-offres/"]'):
+        href = (link.attributes.get("href") or "").strip()
+        if not href:
             continue
+        full = urljoin(BASE_URL, href).split("#")[0]
+        if not _is_job_detail_url(full):
+            continue
+        if full in seen:
+            continue
+        li = link.parent
+        while li is not None and li.tag != "li":
+            li = li.parent
+        if li is None:
+            continue
+        seen.add(full)
+        base = _parse_li_node(li)
+        base["url"] = full
+        out.append(base)
+    return out
+
+
+def iter_pages(session: requests.Session, page1_url: str, max_pages: int, delay: float = 0.0):
+    """Gera (pagina, links) a partir da pagina 2; termina no primeiro erro ou pagina vazia."""
+    for page in range(2, max_pages + 1):
+        if page > 2 and delay > 0:
+            time.sleep(delay)
+        page_url = set_page_param(page1_url, page)
+        try:
+            with session.get(page_url, timeout=30, stream=True) as pr:
+                if pr.status_code >= 400:
+                    return
+                page_html = pr.content
+        except requests.RequestException as exc:
+            print(f"  [WARN] Falha ao carregar pagina {page} ({exc}). Paragem segura da paginacao.")
+            return
+        items = extract_detail_links(page_html)
+        if not items:
+            print(f"  Pagina {page}: 0 links (fim)")
+            return
+
+        print(f"  Pagina {page}: {len(items)} links")
+        yield page, items
+
+
+def extract_detail_links(html: str | bytes) -> list[dict]:
+    if FastHTMLParser is not None:
+        return _extract_detail_links_fast(html)
+
+    soup = BeautifulSoup(html, HTML_PARSER)
+    out: list[dict] = []
+    seen: set[str] = set()
+
+    for link in soup.select('a[href*="/offres-emploi-etat-geneve/liste-offres/"]'):
         href = (link.get("href") or "").strip()
         if not href:
             continue
@@ -134,6 +292,9 @@ def extract_detail_links(html: str) -> list[dict]:
             continue
         if full in seen:
             continue
+        li = link.find_parent("li")
+        if li is None:
+            continue
         seen.add(full)
         base = _parse_li_card(li)
         base["url"] = full
@@ -141,6 +302,7 @@ def extract_detail_links(html: str) -> list[dict]:
     return out
 
 
+@lru_cache(maxsize=4096)
 def _parse_fr_date(raw: str | None) -> str | None:
     if not raw:
         return None
@@ -153,41 +315,94 @@ def _parse_fr_date(raw: str | None) -> str | None:
     return None
 
 
-def fetch_rss_map(session: requests.Session, timeout: int = 30) -> dict[str, dict]:
-    out: dict[str, dict] = {}
-    r = session.get(RSS_URL, timeout=timeout)
-    r.raise_for_status()
-    root = ET.fromstring(r.text)
+def _first_date_by_label(pattern: re.Pattern, text: str) -> str | None:
+    # Uma so passagem pelo texto: guarda a primeira data de cada rotulo e escolhe por prioridade.
+    # A busca recomeca no fim do rotulo (e nao do match) para nao saltar rotulos que ficam
+    # entre um rotulo e a sua data.
+    labels = [name for name in pattern.groupindex if name != "date"]
+    first: dict[str, str] = {}
+    pos = 0
+    while len(first) < len(labels) and (m := pattern.search(text, pos)):
+        label = next(name for name in labels if m.group(name) is not None)
+        first.setdefault(label, m.group("date"))
+        pos = m.end(label)
+    for label in labels:
+        parsed = _parse_fr_date(first.get(label))
+        if parsed:
+            return parsed
+    return None
 
-    for item in root.findall(".//item"):
-        link = (item.findtext("link") or "").strip()
-        if not link:
-            continue
-        pub_date = (item.findtext("pubDate") or "").strip()
-        desc_html = (item.findtext("description") or "").strip()
-        title = (item.findtext("title") or "").strip()
-
-        posting_date = None
-        if pub_date:
-            try:
-                posting_date = parsedate_to_datetime(pub_date).date().isoformat()
-            except Exception:
-                posting_date = None
-
-        desc_text = _clean_text(BeautifulSoup(desc_html, "html.parser").get_text(" ", strip=True), 1200)
-        out[link] = {
-            "posting_date": posting_date,
-            "summary": desc_text,
-            "title": _clean_text(title, 240),
-        }
+
+def fetch_rss_map(
+    session: requests.Session,
+    timeout: int = 30,
+    validators: dict | None = None,
+) -> dict[str, dict] | None:
+    """
+    Com `validators` ({"etag", "last_modified"}) faz um GET condicional e devolve None
+    quando o feed nao mudou (304). O dict e atualizado com os validadores da resposta.
+    """
+    out: dict[str, dict] = {}
+    headers: dict[str, str] = {}
+    if validators is not None:
+        if validators.get("etag"):
+            headers["If-None-Match"] = str(validators["etag"])
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = str(validators["last_modified"])
+    with session.get(RSS_URL, timeout=timeout, headers=headers, stream=True) as r:
+        if r.status_code == 304:
+            return None
+        r.raise_for_status()
+        if validators is not None:
+            validators["etag"] = r.headers.get("ETag")
+            validators["last_modified"] = r.headers.get("Last-Modified")
+        # iterparse le o corpo em streaming; cada <item> e libertado depois de lido.
+        r.raw.decode_content = True
+        for _, item in ET.iterparse(r.raw, events=("end",)):
+            if item.tag != "item":
+                continue
+            row = _parse_rss_item(item)
+            item.clear()
+            if row:
+                out[row.pop("link")] = row
     return out
 
 
+def _parse_rss_item(item: ET.Element) -> dict | None:
+    link = (item.findtext("link") or "").strip()
+    if not link:
+        return None
+    pub_date = (item.findtext("pubDate") or "").strip()
+    desc_html = (item.findtext("description") or "").strip()
+    title = (item.findtext("title") or "").strip()
+
+    posting_date = None
+    if pub_date:
+        try:
+            posting_date = parsedate_to_datetime(pub_date).date().isoformat()
+        except Exception:
+            posting_date = None
+
+    # A descricao do RSS so precisa de texto plano: evita uma arvore BS4 por item.
+    desc_text = _clean_text(_TAG_RE.sub(" ", desc_html), 1200)
+    return {
+        "link": link,
+        "posting_date": posting_date,
+        "summary": desc_text,
+        "title": _clean_text(title, 240),
+    }
+
+
 def fetch_detail(session: requests.Session, url: str, timeout: int = 30) -> dict:
-    r = session.get(url, timeout=timeout)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
-    main_content = soup.find("main") or soup.find("article") or soup
+    # O parser recebe os bytes e deteta o encoding, sem passar por r.text.
+    with session.get(url, timeout=timeout, stream=True) as r:
+        r.raise_for_status()
+        content = r.content
+    soup = BeautifulSoup(content, HTML_PARSER, parse_only=_DETAIL_STRAINER)
+    main_content = soup.find("main") or soup.find("article")
+    if main_content is None:
+        soup = BeautifulSoup(content, HTML_PARSER)
+        main_content = soup
     text = main_content.get_text(separator=" ", strip=True)
 
     title = None
@@ -201,30 +416,8 @@ def fetch_detail(session: requests.Session, url: str, timeout: int = 30) -> dict
     if long_paras:
         description = _clean_text(long_paras[0], 2200)
 
-    posting_date = None
-    date_patterns = [
-        r"publi[eé]\s*le[^\d]*(\d{1,2}[./]\d{1,2}[./]\d{2,4})",
-        r"mise en ligne[^\d]*(\d{1,2}[./]\d{1,2}[./]\d{2,4})",
-    ]
-    for pat in date_patterns:
-        m = re.search(pat, text, flags=re.IGNORECASE)
-        if m:
-            posting_date = _parse_fr_date(m.group(1))
-            if posting_date:
-                break
-
-    date_limite = None
-    deadline_patterns = [
-        r"date limite[^\d]*(\d{1,2}[./]\d{1,2}[./]\d{2,4})",
-        r"d[ée]lai de candidature[^\d]*(\d{1,2}[./]\d{1,2}[./]\d{2,4})",
-        r"avant le[^\d]*(\d{1,2}[./]\d{1,2}[./]\d{2,4})",
-    ]
-    for pat in deadline_patterns:
-        m = re.search(pat, text, flags=re.IGNORECASE)
-        if m:
-            date_limite = _parse_fr_date(m.group(1))
-            if date_limite:
-                break
+    posting_date = _first_date_by_label(_POST_DATE_RE, text)
+    date_limite = _first_date_by_label(_DEADLINE_RE, text)
 
     return {
         "title": title,
@@ -236,6 +429,35 @@ def fetch_detail(session: requests.Session, url: str, timeout: int = 30) -> dict
     }
 
 
+class RateLimiter:
+    """Garante um intervalo minimo entre pedidos, partilhado entre threads."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = max(0.0, interval)
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _fetch_detail_safe(session: requests.Session, url: str, limiter: RateLimiter) -> dict | None:
+    limiter.wait()
+    try:
+        return fetch_detail(session, url)
+    except Exception:
+        return None
+
+
+# date.today() e constante dentro de uma execucao, por isso o cache e seguro.
+@lru_cache(maxsize=4096)
 def within_days(posting_date: str | None, max_days: int | None) -> bool:
     if max_days is None:
         return True
@@ -252,7 +474,12 @@ def within_days(posting_date: str | None, max_days: int | None) -> bool:
 def save_json(path: str, rows: list[dict]) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(rows, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    if orjson is not None:
+        p.write_bytes(orjson.dumps(rows, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+        return
+    with p.open("w", encoding="utf-8", buffering=1 << 20) as f:
+        json.dump(rows, f, ensure_ascii=False, indent=2)
+        f.write("\n")
 
 
 def save_csv(path: str, jobs: list[dict]) -> None:
@@ -271,11 +498,15 @@ def save_csv(path: str, jobs: list[dict]) -> None:
     ]
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
+    getter = itemgetter(*fields)
+    field_set = set(fields)
     with p.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        for row in jobs:
-            writer.writerow({k: row.get(k) for k in fields})
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        # itemgetter so serve quando a linha tem todas as colunas; caso contrario usa get().
+        writer.writerows(
+            getter(row) if field_set <= row.keys() else [row.get(k) for k in fields] for row in jobs
+        )
 
 
 def load_json_jobs(path: str) -> list[dict]:
@@ -303,9 +534,13 @@ def load_state(path: str) -> dict:
 
 
 def save_state(path: str, payload: dict) -> None:
+    # Ficheiro so lido pela maquina: formato compacto, sem indentacao.
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    if orjson is not None:
+        p.write_bytes(orjson.dumps(payload))
+    else:
+        p.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
 
 
 def merge_jobs_by_url(current: list[dict], fresh: list[dict]) -> list[dict]:
@@ -316,8 +551,6 @@ def merge_jobs_by_url(current: list[dict], fresh: list[dict]) -> list[dict]:
         raw_id = row.get("id")
         if isinstance(raw_id, int) and raw_id > max_id:
             max_id = raw_id
-
-    for row in current:
         url = str(row.get("url") or "").strip()
         if not url:
             continue
@@ -341,9 +574,8 @@ def merge_jobs_by_url(current: list[dict], fresh: list[dict]) -> list[dict]:
             max_id += 1
             row["id"] = max_id
 
-    out = list(merged.values())
-    out.sort(key=lambda r: int(r.get("id")) if isinstance(r.get("id"), int) else 0, reverse=True)
-    return out
+    # Neste ponto todos os ids sao int, por isso itemgetter chega como chave.
+    return sorted(merged.values(), key=itemgetter("id"), reverse=True)
 
 
 def main() -> None:
@@ -354,6 +586,7 @@ def main() -> None:
     parser.add_argument("--max-jobs", type=int, default=0, help="Maximo de vagas em detalhe (0 = sem limite)")
     parser.add_argument("--days", type=int, default=30, help="Filtra vagas dos ultimos N dias (0 = sem filtro)")
     parser.add_argument("--delay", type=float, default=0.2, help="Espera entre pedidos em segundos")
+    parser.add_argument("--workers", type=int, default=8, help="Pedidos de detalhe em paralelo")
     parser.add_argument(
         "--stop-after-seen",
         type=int,
@@ -372,13 +605,19 @@ def main() -> None:
     output_json = args.output_json.strip() or str(Path("data") / "ge" / "professions.json")
     output_path = Path(output_json)
     auto_state_file = str(output_path.with_name(f"{output_path.stem}.state.json"))
+    rss_cache_file = str(output_path.with_name(f"{output_path.stem}.rss.json"))
 
-    existing_jobs = load_json_jobs(output_json)
-    known_urls = {str(j.get("url") or "").strip() for j in existing_jobs if str(j.get("url") or "").strip()}
+    # O estado guarda exatamente os URLs do JSON final, por isso o JSON de dados
+    # so e lido aqui quando ainda nao ha estado (primeira execucao).
+    existing_jobs: list[dict] | None = None
     auto_state = load_state(auto_state_file)
-    state_urls = auto_state.get("seen_urls") if isinstance(auto_state, dict) else []
+    known_urls: set[str] = set()
+    state_urls = auto_state.get("seen_urls")
     if isinstance(state_urls, list):
         known_urls.update(str(u).strip() for u in state_urls if str(u).strip())
+    if not known_urls:
+        existing_jobs = load_json_jobs(output_json)
+        known_urls = {str(j.get("url") or "").strip() for j in existing_jobs if str(j.get("url") or "").strip()}
 
     if known_urls:
         print(
@@ -386,13 +625,26 @@ def main() -> None:
             f"(dados + estado: {auto_state_file})"
         )
 
-    session = requests.Session()
-    session.headers.update(DEFAULT_HEADERS)
+    session = build_session(pool_size=max(16, args.workers))
 
     rss_map: dict[str, dict] = {}
+    cached_rss = {k: v for k, v in load_state(rss_cache_file).items() if isinstance(v, dict)}
+    rss_validators: dict = {}
+    if cached_rss:
+        # Sem cache local nao faz sentido um GET condicional: um 304 deixaria o mapa vazio.
+        rss_validators = {
+            "etag": auto_state.get("rss_etag"),
+            "last_modified": auto_state.get("rss_last_modified"),
+        }
     try:
-        rss_map = fetch_rss_map(session)
-        print(f"[RSS] Entradas carregadas: {len(rss_map)}")
+        fetched_rss = fetch_rss_map(session, validators=rss_validators)
+        if fetched_rss is None:
+            rss_map = cached_rss
+            print(f"[RSS] Feed inalterado (304): {len(rss_map)} entradas em cache")
+        else:
+            rss_map = fetched_rss
+            save_state(rss_cache_file, rss_map)
+            print(f"[RSS] Entradas carregadas: {len(rss_map)}")
     except Exception as exc:
         print(f"[WARN] RSS indisponivel ({exc}). A continuar sem RSS.")
 
@@ -400,12 +652,12 @@ def main() -> None:
     print(f"[SEARCH] Pagina base: {page1_url}")
 
     try:
-        r = session.get(page1_url, timeout=30)
-        r.raise_for_status()
-        page1_html = r.text
+        with session.get(page1_url, timeout=30, stream=True) as r:
+            r.raise_for_status()
+            page1_html = r.content
     except requests.RequestException as exc:
         print(f"[WARN] Falha ao carregar pagina base ({exc}). Seguindo sem novos links nesta execucao.")
-        page1_html = ""
+        page1_html = b""
 
     page1_items = extract_detail_links(page1_html) if page1_html else []
     print(f"  Pagina 1: {len(page1_items)} links")
@@ -413,29 +665,22 @@ def main() -> None:
     links: list[dict] = []
     seen_links: set[str] = set()
     known_streak = 0
+    max_jobs = args.max_jobs if args.max_jobs and args.max_jobs > 0 else 0
+    new_links = 0
 
     for item in page1_items:
         url = str(item.get("url") or "").strip()
         if url and url not in seen_links:
             seen_links.add(url)
             links.append(item)
+            if url not in known_urls:
+                new_links += 1
 
     max_dyn = args.max_pages if args.max_pages and args.max_pages > 0 else 200
-    for page in range(2, max_dyn + 1):
-        page_url = set_page_param(page1_url, page)
-        try:
-            pr = session.get(page_url, timeout=30)
-        except requests.RequestException as exc:
-            print(f"  [WARN] Falha ao carregar pagina {page} ({exc}). Paragem segura da paginacao.")
-            break
-        if pr.status_code >= 400:
-            break
-        items = extract_detail_links(pr.text)
-        if not items:
-            print(f"  Pagina {page}: 0 links (fim)")
-            break
-
-        print(f"  Pagina {page}: {len(items)} links")
+    if max_jobs and new_links >= max_jobs:
+        # A pagina 1 ja cobre o limite de detalhe: nao ha razao para paginar.
+        max_dyn = 1
+    for page, items in iter_pages(session, page1_url, max_dyn, delay=args.delay):
         added_this_page = 0
         for item in items:
             url = str(item.get("url") or "").strip()
@@ -444,6 +689,10 @@ def main() -> None:
             seen_links.add(url)
             links.append(item)
             added_this_page += 1
+            if url not in known_urls:
+                new_links += 1
+                if max_jobs and new_links >= max_jobs:
+                    break
 
             if args.stop_after_seen > 0:
                 if url in known_urls:
@@ -454,6 +703,10 @@ def main() -> None:
                 else:
                     known_streak = 0
 
+        if max_jobs and new_links >= max_jobs:
+            print(f"  Paragem: limite de {max_jobs} links novos atingido")
+            break
+
         if args.stop_after_seen > 0 and known_streak >= args.stop_after_seen:
             break
 
@@ -461,9 +714,6 @@ def main() -> None:
             print(f"  Pagina {page}: 0 links novos (fim)")
             break
 
-        if args.delay > 0:
-            time.sleep(args.delay)
-
     print(f"[LINKS] Links unicos: {len(links)}")
 
     detail_items = [x for x in links if str(x.get("url") or "").strip() not in known_urls]
@@ -476,37 +726,42 @@ def main() -> None:
     fresh_jobs: list[dict] = []
     max_days = args.days if args.days and args.days > 0 else None
 
-    for idx, item in enumerate(detail_items, start=1):
-        url = str(item.get("url") or "").strip()
-        if not url:
-            continue
-        try:
-            detail = fetch_detail(session, url)
-        except Exception:
-            continue
+    detail_items = [x for x in detail_items if str(x.get("url") or "").strip()]
+    limiter = RateLimiter(args.delay)
+    workers = max(1, args.workers)
 
-        rss = rss_map.get(url, {})
-        row = {
-            "title": detail.get("title") or item.get("title") or rss.get("title"),
-            "departement": item.get("departement"),
-            "taux": item.get("taux"),
-            "remuneration": item.get("remuneration"),
-            "description": detail.get("description"),
-            "summary": rss.get("summary"),
-            "posting_date": detail.get("posting_date") or rss.get("posting_date"),
-            "date_limite": detail.get("date_limite"),
-            "url": url,
-            "source": "ge",
-        }
-        if not within_days(row.get("posting_date"), max_days):
-            continue
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map preserva a ordem de detail_items, mantendo os ids atribuidos no merge estaveis.
+        details = executor.map(
+            lambda it: _fetch_detail_safe(session, str(it.get("url") or "").strip(), limiter),
+            detail_items,
+        )
+        for idx, (item, detail) in enumerate(zip(detail_items, details), start=1):
+            if detail is None:
+                continue
+            url = str(item.get("url") or "").strip()
+            rss = rss_map.get(url, {})
+            row = {
+                "title": detail.get("title") or item.get("title") or rss.get("title"),
+                "departement": item.get("departement"),
+                "taux": item.get("taux"),
+                "remuneration": item.get("remuneration"),
+                "description": detail.get("description"),
+                "summary": rss.get("summary"),
+                "posting_date": detail.get("posting_date") or rss.get("posting_date"),
+                "date_limite": detail.get("date_limite"),
+                "url": url,
+                "source": "ge",
+            }
+            if not within_days(row.get("posting_date"), max_days):
+                continue
 
-        fresh_jobs.append(row)
-        if idx % 25 == 0:
-            print(f"  Detalhes processados: {idx}/{len(detail_items)}")
-        if args.delay > 0:
-            time.sleep(args.delay)
+            fresh_jobs.append(row)
+            if idx % 25 == 0:
+                print(f"  Detalhes processados: {idx}/{len(detail_items)}")
 
+    if existing_jobs is None:
+        existing_jobs = load_json_jobs(output_json)
     merged = merge_jobs_by_url(existing_jobs, fresh_jobs)
     filtered = [row for row in merged if within_days(row.get("posting_date"), max_days)]
 
@@ -518,6 +773,8 @@ def main() -> None:
             "last_run_at": datetime.now().isoformat(timespec="seconds"),
             "seen_urls": sorted(seen_now),
             "output_json": output_json,
+            "rss_etag": rss_validators.get("etag"),
+            "rss_last_modified": rss_validators.get("last_modified"),
         },
     )
     print(f"[SAVE] Estado incremental salvo: {auto_state_file} ({len(seen_now)} URLs)")
@@ -526,7 +783,7 @@ def main() -> None:
     print(f"[SAVE] JSON salvo: {output_json} ({len(filtered)} vagas)")
 
     if args.save_csv:
-        csv_name = re.sub(r"\.json$", ".csv", output_json, flags=re.IGNORECASE)
+        csv_name = _JSON_EXT_RE.sub(".csv", output_json)
         if csv_name == output_json:
             csv_name = f"{output_json}.csv"
         save_csv(csv_name, filtered)
@@ -4,18 +4,36 @@ Scraper de vagas no job-room.ch (SECO/RAV) com incremental automatico.
 """
 
 import argparse
-import builtins
 import csv
 import json
+import logging
+import random
 import re
+import sys
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date, datetime
+from itertools import pairwise
+from operator import itemgetter
 from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 BASE_URL = "https://www.job-room.ch"
 SEARCH_ENDPOINT = "/jobadservice/api/jobAdvertisements/_search"
+DETAIL_URL_PREFIX = f"{BASE_URL}/job-search/detail/"
 LANG_TO_NG = {
     "fr": "ZnI=",
     "de": "ZGU=",
@@ -33,6 +51,8 @@ DEFAULT_HEADERS = {
     "Origin": "https://www.job-room.ch",
     "Referer": "https://www.job-room.ch/job-search",
 }
+# Acima disto o JSON de dados e lido em streaming (ijson) para nao duplicar o pico de memoria.
+STREAM_JSON_MIN_BYTES = 32 * 1024 * 1024
 LOCALITIES = {
     "GE": {"communalCodes": ["6621"], "geoPoint": {"lat": 46.222, "lon": 6.124}, "label": "Geneve"},
     "VD": {"communalCodes": ["5586"], "geoPoint": {"lat": 46.516, "lon": 6.632}, "label": "Lausanne"},
@@ -42,7 +62,7 @@ LOCALITIES = {
     "BE": {"communalCodes": ["351"], "geoPoint": {"lat": 46.948, "lon": 7.447}, "label": "Berne"},
 }
 
-FR_HINTS = {
+FR_HINTS = frozenset({
     "avec",
     "pour",
     "poste",
@@ -62,15 +82,39 @@ FR_HINTS = {
     "assurer",
     "recherche",
     "candidat",
-}
-EN_HINTS = {"with", "for", "you", "team", "experience", "job", "position", "skills", "work", "english"}
-DE_HINTS = {"mit", "fur", "sie", "erfahrung", "stelle", "aufgaben", "kenntnisse", "arbeit", "deutsch"}
-IT_HINTS = {"con", "per", "lavoro", "posizione", "esperienza", "richiesto", "competenze", "squadra"}
+})
+EN_HINTS = frozenset({"with", "for", "you", "team", "experience", "job", "position", "skills", "work", "english"})
+DE_HINTS = frozenset({"mit", "fur", "sie", "erfahrung", "stelle", "aufgaben", "kenntnisse", "arbeit", "deutsch"})
+IT_HINTS = frozenset({"con", "per", "lavoro", "posizione", "esperienza", "richiesto", "competenze", "squadra"})
+
+# palavra -> indices em HINT_LANG_CODES onde e pista (ex.: "experience" conta para fr e en).
+HINT_LANG_CODES = ("fr", "en", "de", "it")
+HINT_LANGS: dict[str, tuple[int, ...]] = {}
+for _idx, _hints in enumerate((FR_HINTS, EN_HINTS, DE_HINTS, IT_HINTS)):
+    for _word in _hints:
+        HINT_LANGS[_word] = HINT_LANGS.get(_word, ()) + (_idx,)
+del _idx, _hints, _word
 
+_WORD_RE = re.compile(r"[a-z]{3,}")
+_JSON_EXT_RE = re.compile(r"\.json$", re.IGNORECASE)
 
-def print(*args, **kwargs):  # type: ignore[override]
-    kwargs.setdefault("flush", True)
-    return builtins.print(*args, **kwargs)
+
+logger = logging.getLogger(__name__)
+
+
+def build_session(pool_size: int = 8) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    # O POST de pesquisa e idempotente, por isso pode ser repetido em 5xx transitorios.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
 
 
 def _normalize_lang(lang: str) -> str:
@@ -96,22 +140,22 @@ def _days_ago(posting_date: str | None) -> int | None:
 
 
 def _pick_description(descriptions: list[dict], preferred_lang: str) -> tuple[str | None, str | None, set[str]]:
-    lang_codes = {str(d.get("languageIsoCode") or "").lower() for d in descriptions if isinstance(d, dict)}
-
-    def pick(lang: str) -> tuple[str | None, str | None]:
-        for d in descriptions:
-            if not isinstance(d, dict):
-                continue
-            if str(d.get("languageIsoCode") or "").lower() == lang:
-                title = str(d.get("title") or "").strip() or None
-                desc = str(d.get("description") or "").strip() or None
-                return title, desc
-        return None, None
-
-    title, desc = pick(preferred_lang)
+    # Uma passagem: primeira descricao de cada idioma, como a antiga procura linear.
+    by_lang: dict[str, tuple[str | None, str | None]] = {}
+    for d in descriptions:
+        if not isinstance(d, dict):
+            continue
+        code = str(d.get("languageIsoCode") or "").lower()
+        if code not in by_lang:
+            by_lang[code] = (
+                str(d.get("title") or "").strip() or None,
+                str(d.get("description") or "").strip() or None,
+            )
+
+    title, desc = by_lang.get(preferred_lang, (None, None))
     if not title and not desc:
         for alt in ("fr", "de", "it", "en"):
-            title, desc = pick(alt)
+            title, desc = by_lang.get(alt, (None, None))
             if title or desc:
                 break
 
@@ -120,43 +164,53 @@ def _pick_description(descriptions: list[dict], preferred_lang: str) -> tuple[st
     if not desc and descriptions and isinstance(descriptions[0], dict):
         desc = str(descriptions[0].get("description") or "").strip() or None
 
-    return title, desc, lang_codes
+    return title, desc, set(by_lang)
+
+
+def _as_dict(value) -> dict:
+    return value if isinstance(value, dict) else {}
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else []
+
+
+def _clean(value, default: str | None = "") -> str | None:
+    return str(value or "").strip() or default
+
+
+def _extract_url(item: dict) -> str:
+    """URL canonico do anuncio, sem normalizar o resto do registo."""
+    ja = _as_dict(item.get("jobAdvertisement", item))
+    jc = _as_dict(ja.get("jobContent"))
+    # URLs internados: o `in known_urls` compara primeiro por identidade.
+    external_url = _clean(jc.get("externalUrl"))
+    if external_url:
+        return sys.intern(external_url)
+    external_id = _clean(ja.get("id") or ja.get("stellennummerEgov"))
+    return sys.intern(f"{DETAIL_URL_PREFIX}{external_id}") if external_id else ""
 
 
 def normalize(item: dict, preferred_lang: str = "fr") -> dict:
-    ja = item.get("jobAdvertisement", item)
-    if not isinstance(ja, dict):
-        ja = {}
-    jc = ja.get("jobContent") or {}
-    if not isinstance(jc, dict):
-        jc = {}
-
-    descriptions = jc.get("jobDescriptions") or []
-    if not isinstance(descriptions, list):
-        descriptions = []
+    ja = _as_dict(item.get("jobAdvertisement", item))
+    jc = _as_dict(ja.get("jobContent"))
+
+    descriptions = _as_list(jc.get("jobDescriptions"))
     title, desc, lang_codes = _pick_description(descriptions, preferred_lang)
 
-    employer = jc.get("employer") or {}
-    if not isinstance(employer, dict):
-        employer = {}
-    company = str(employer.get("name") or "").strip() or "N/A"
-
-    location_obj = jc.get("location") or {}
-    if not isinstance(location_obj, dict):
-        location_obj = {}
-    location = str(location_obj.get("city") or location_obj.get("communalName") or "").strip() or "N/A"
-    postal_code = str(location_obj.get("zipCode") or "").strip()
-    canton = str(location_obj.get("cantonCode") or "").strip()
-
-    publication = ja.get("publication") or {}
-    if not isinstance(publication, dict):
-        publication = {}
+    employer = _as_dict(jc.get("employer"))
+    company = _clean(employer.get("name"), "N/A")
+
+    location_obj = _as_dict(jc.get("location"))
+    location = _clean(location_obj.get("city") or location_obj.get("communalName"), "N/A")
+    postal_code = _clean(location_obj.get("zipCode"))
+    canton = _clean(location_obj.get("cantonCode"))
+
+    publication = _as_dict(ja.get("publication"))
     posting_date = _date_iso(publication.get("startDate") or ja.get("createdTime"))
     expiry_date = _date_iso(publication.get("endDate"))
 
-    employment = jc.get("employment") or {}
-    if not isinstance(employment, dict):
-        employment = {}
+    employment = _as_dict(jc.get("employment"))
     wl_min = employment.get("workloadPercentageMin")
     wl_max = employment.get("workloadPercentageMax")
     if isinstance(wl_min, (int, float)) and isinstance(wl_max, (int, float)):
@@ -174,9 +228,8 @@ def normalize(item: dict, preferred_lang: str = "fr") -> dict:
     else:
         contract_type = ""
 
-    external_id = str(ja.get("id") or ja.get("stellennummerEgov") or "").strip()
-    external_url = str(jc.get("externalUrl") or "").strip()
-    url = external_url or (f"https://www.job-room.ch/job-search/detail/{external_id}" if external_id else "")
+    external_id = _clean(ja.get("id") or ja.get("stellennummerEgov"))
+    url = _extract_url(item)
 
     rav_exclusive = bool(ja.get("reportingObligation"))
     description = (str(desc or "")[:2500]).strip() or None
@@ -207,11 +260,18 @@ def is_french_job(row: dict) -> bool:
         return True
 
     text = f"{row.get('title') or ''} {row.get('description') or ''}".lower()
-    tokens = set(re.findall(r"[a-zA-Z]{3,}", text))
-    fr = len(tokens & FR_HINTS)
-    en = len(tokens & EN_HINTS)
-    de = len(tokens & DE_HINTS)
-    it = len(tokens & IT_HINTS)
+    # Uma so passagem pelos tokens; cada pista conta uma vez, como na intersecao de sets.
+    counts = [0] * len(HINT_LANG_CODES)
+    matched: set[str] = set()
+    for m in _WORD_RE.finditer(text):
+        token = m.group()
+        langs = HINT_LANGS.get(token)
+        if langs is None or token in matched:
+            continue
+        matched.add(token)
+        for idx in langs:
+            counts[idx] += 1
+    fr, en, de, it = counts
     return fr >= 2 and fr >= max(en, de, it)
 
 
@@ -284,10 +344,18 @@ def within_days(posting_date: str | None, max_days: int | None) -> bool:
     return 0 <= age <= max_days
 
 
+def _read_json(p: Path):
+    raw = p.read_bytes()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
+
+
 def save_json(path: str, rows: list[dict]) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(rows, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    if orjson is not None:
+        p.write_bytes(orjson.dumps(rows, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    else:
+        p.write_text(json.dumps(rows, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
 
 
 def save_csv(path: str, rows: list[dict]) -> None:
@@ -309,10 +377,9 @@ def save_csv(path: str, rows: list[dict]) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
     with p.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({k: row.get(k) for k in fields})
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        writer.writerows([row.get(k) for k in fields] for row in rows)
 
 
 def load_json_jobs(path: str) -> list[dict]:
@@ -320,7 +387,10 @@ def load_json_jobs(path: str) -> list[dict]:
     if not p.exists():
         return []
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        if ijson is not None and p.stat().st_size >= STREAM_JSON_MIN_BYTES:
+            with p.open("rb") as f:
+                return [x for x in ijson.items(f, "item", use_float=True) if isinstance(x, dict)]
+        data = _read_json(p)
     except Exception:
         return []
     if not isinstance(data, list):
@@ -333,7 +403,7 @@ def load_state(path: str) -> dict:
     if not p.exists():
         return {}
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        data = _read_json(p)
     except Exception:
         return {}
     return data if isinstance(data, dict) else {}
@@ -342,23 +412,58 @@ def load_state(path: str) -> dict:
 def save_state(path: str, payload: dict) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Ficheiro so lido pela maquina: formato compacto, sem indentacao.
+    if orjson is not None:
+        p.write_bytes(orjson.dumps(payload))
+    else:
+        p.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+
+def pack_seen_urls(urls: set[str]) -> dict:
+    """
+    Guarda no estado so o id dos URLs de detalhe (o prefixo e comum a quase todos);
+    URLs externos ficam completos em `seen_urls`.
+    """
+    ids: list[str] = []
+    others: list[str] = []
+    prefix_len = len(DETAIL_URL_PREFIX)
+    for url in urls:
+        if url.startswith(DETAIL_URL_PREFIX):
+            ids.append(url[prefix_len:])
+        else:
+            others.append(url)
+    return {"seen_prefix": DETAIL_URL_PREFIX, "seen_ids": sorted(ids), "seen_urls": sorted(others)}
+
+
+def unpack_seen_urls(state: dict) -> set[str]:
+    # Estados antigos so tem `seen_urls` com URLs completos; continuam validos.
+    out: set[str] = set()
+    state_urls = state.get("seen_urls")
+    if isinstance(state_urls, list):
+        out.update(u for x in state_urls if (u := str(x).strip()))
+    prefix = state.get("seen_prefix")
+    ids = state.get("seen_ids")
+    if isinstance(prefix, str) and isinstance(ids, list):
+        out.update(prefix + i for x in ids if (i := str(x).strip()))
+    return out
 
 
 def merge_jobs_by_url(current: list[dict], fresh: list[dict]) -> list[dict]:
     merged: dict[str, dict] = {}
+    missing_id = False
     max_id = 0
 
     for row in current:
         raw_id = row.get("id")
-        if isinstance(raw_id, int) and raw_id > max_id:
+        has_id = isinstance(raw_id, int)
+        if has_id and raw_id > max_id:
             max_id = raw_id
-
-    for row in current:
         url = str(row.get("url") or "").strip()
         if not url:
             continue
+        row.setdefault("source", "jobroom")
         merged[url] = row
+        missing_id = missing_id or not has_id
 
     for row in fresh:
         url = str(row.get("url") or "").strip()
@@ -370,20 +475,24 @@ def merge_jobs_by_url(current: list[dict], fresh: list[dict]) -> list[dict]:
         else:
             max_id += 1
             row["id"] = max_id
+        row.setdefault("source", "jobroom")
         merged[url] = row
 
-    for row in merged.values():
-        row.setdefault("source", "jobroom")
-        if not isinstance(row.get("id"), int):
-            max_id += 1
-            row["id"] = max_id
+    # Registos antigos sem id recebem ids depois dos novos; raro, por isso so se percorre quando preciso.
+    if missing_id:
+        for row in merged.values():
+            if not isinstance(row.get("id"), int):
+                max_id += 1
+                row["id"] = max_id
 
     out = list(merged.values())
-    out.sort(key=lambda r: int(r.get("id")) if isinstance(r.get("id"), int) else 0, reverse=True)
+    if any(a["id"] < b["id"] for a, b in pairwise(out)):
+        out.sort(key=itemgetter("id"), reverse=True)
     return out
 
 
 def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     parser = argparse.ArgumentParser(description="Scraper de vagas no job-room.ch")
     parser.add_argument("--canton", type=str, default="GE", choices=list(LOCALITIES.keys()), help="Cantao da pesquisa")
     parser.add_argument("--lang", type=str, default="fr", help="Idioma da API (_ng): fr/de/it/en")
@@ -393,6 +502,7 @@ def main() -> None:
     parser.add_argument("--max-jobs", type=int, default=0, help="Maximo de vagas em detalhe (0 = sem limite)")
     parser.add_argument("--days", type=int, default=30, help="Filtra vagas dos ultimos N dias (0 = sem filtro)")
     parser.add_argument("--delay", type=float, default=0.2, help="Espera entre pedidos em segundos")
+    parser.add_argument("--workers", type=int, default=8, help="Paginas pedidas em paralelo")
     parser.add_argument(
         "--stop-after-seen",
         type=int,
@@ -428,139 +538,182 @@ def main() -> None:
     auto_state_file = str(output_path.with_name(f"{output_path.stem}.state.json"))
 
     existing_jobs = load_json_jobs(output_json)
-    known_urls = {str(j.get("url") or "").strip() for j in existing_jobs if str(j.get("url") or "").strip()}
+    # normalize ja grava o URL limpo (ver _extract_url), por isso nao se repete o str/strip.
+    known_urls = {sys.intern(u) for j in existing_jobs if isinstance(u := j.get("url"), str) and u}
     auto_state = load_state(auto_state_file)
-    state_urls = auto_state.get("seen_urls") if isinstance(auto_state, dict) else []
-    if isinstance(state_urls, list):
-        known_urls.update(str(x).strip() for x in state_urls if str(x).strip())
+    known_urls.update(map(sys.intern, unpack_seen_urls(auto_state)))
 
     if known_urls:
-        print(
-            f"[INCREMENTAL] Execucao automatica: {len(known_urls)} URLs conhecidas "
-            f"(dados + estado: {auto_state_file})"
+        logger.info(
+            "[INCREMENTAL] Execucao automatica: %d URLs conhecidas (dados + estado: %s)",
+            len(known_urls),
+            auto_state_file,
         )
 
-    session = requests.Session()
-    session.headers.update(DEFAULT_HEADERS)
+    workers = max(1, args.workers)
+    session = build_session(pool_size=workers)
 
-    print(
-        f"[SEARCH] Fonte: job-room.ch | cantao={args.canton} | lang={_normalize_lang(args.lang)} "
-        f"| days={args.days} | radius={args.radius} | keyword='{args.keyword}'"
+    logger.info(
+        "[SEARCH] Fonte: job-room.ch | cantao=%s | lang=%s | days=%s | radius=%s | keyword='%s'",
+        args.canton,
+        _normalize_lang(args.lang),
+        args.days,
+        args.radius,
+        args.keyword,
     )
     if args.max_pages and args.max_pages > 0:
-        print(f"[PAGES] A processar (manual): ate {args.max_pages}")
+        logger.info("[PAGES] A processar (manual): ate %s", args.max_pages)
     else:
-        print("[PAGES] A processar: modo dinamico (sem limite fixo)")
+        logger.info("[PAGES] A processar: modo dinamico (sem limite fixo)")
 
     max_days = args.days if args.days and args.days > 0 else None
     filter_french = not args.allow_non_french
+    preferred_lang = _normalize_lang(args.lang)
+    # Valores usados no ciclo de paginas ficam em locais (LOAD_FAST em vez de getattr).
+    max_pages = args.max_pages if args.max_pages and args.max_pages > 0 else 0
+    max_jobs = args.max_jobs if args.max_jobs and args.max_jobs > 0 else 0
+    stop_after_seen = args.stop_after_seen
+    delay = args.delay
 
     fresh_jobs: list[dict] = []
     all_page_urls: list[str] = []
     seen_streak = 0
     total_api_known: int | None = None
+    is_known = known_urls.__contains__
+    fresh_append = fresh_jobs.append
+    page_url_append = all_page_urls.append
+
+    def fetch_page(page_idx: int) -> tuple[list[dict], int | None]:
+        if delay > 0:
+            # Jitter por worker em vez de uma barreira global entre paginas.
+            time.sleep(random.uniform(0, delay))
+        return search_page(
+            session=session,
+            canton=args.canton,
+            days=args.days if args.days > 0 else 3650,
+            keyword=args.keyword,
+            radius=args.radius,
+            page=page_idx,
+            size=25,
+            lang=args.lang,
+        )
 
-    page = 0
-    while True:
-        if args.max_pages and args.max_pages > 0 and page >= args.max_pages:
-            break
-        try:
-            raw_rows, total_api = search_page(
-                session=session,
-                canton=args.canton,
-                days=args.days if args.days > 0 else 3650,
-                keyword=args.keyword,
-                radius=args.radius,
-                page=page,
-                size=25,
-                lang=args.lang,
-            )
-        except requests.HTTPError as exc:
-            status = exc.response.status_code if exc.response is not None else "?"
-            print(f"  [WARN] HTTP {status} na pagina {page + 1}. Paragem segura.")
-            break
-        except requests.RequestException as exc:
-            print(f"  [WARN] Falha de rede na pagina {page + 1}: {exc}")
-            break
-
-        if total_api_known is None and isinstance(total_api, int):
-            total_api_known = total_api
-
-        if not raw_rows:
-            print(f"  Pagina {page + 1}: 0 registos (fim)")
-            break
-
-        print(f"  Pagina {page + 1}: {len(raw_rows)} registos")
-        for raw in raw_rows:
-            row = normalize(raw, preferred_lang=_normalize_lang(args.lang))
-            url = str(row.get("url") or "").strip()
-            if not url:
-                continue
-            all_page_urls.append(url)
-
-            if args.stop_after_seen > 0:
-                if url in known_urls:
-                    seen_streak += 1
-                    if seen_streak >= args.stop_after_seen:
-                        print(f"  Paragem incremental: {seen_streak} links conhecidos em sequencia")
-                        break
-                else:
-                    seen_streak = 0
-
-            if url in known_urls:
-                continue
-            if filter_french and not is_french_job(row):
-                continue
-            if not within_days(row.get("posting_date"), max_days):
-                continue
-
-            fresh_jobs.append(row)
-            if args.max_jobs and args.max_jobs > 0 and len(fresh_jobs) >= args.max_jobs:
+    pending: dict[int, Future] = {}
+    next_page = 0
+
+    def schedule(window: int) -> None:
+        nonlocal next_page
+        while len(pending) < window:
+            if max_pages and next_page >= max_pages:
+                return
+            if isinstance(total_api_known, int) and next_page * 25 >= total_api_known:
+                return
+            pending[next_page] = executor.submit(fetch_page, next_page)
+            next_page += 1
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        page = 0
+        while True:
+            if max_pages and page >= max_pages:
+                break
+            # A primeira pagina vai sozinha para conhecer o total antes de abrir a janela.
+            schedule(1 if page == 0 else workers)
+            future = pending.pop(page, None)
+            if future is None:
+                break
+            try:
+                raw_rows, total_api = future.result()
+            except requests.HTTPError as exc:
+                status = exc.response.status_code if exc.response is not None else "?"
+                logger.warning("  [WARN] HTTP %s na pagina %d. Paragem segura.", status, page + 1)
+                break
+            except requests.RequestException as exc:
+                logger.warning("  [WARN] Falha de rede na pagina %d: %s", page + 1, exc)
                 break
 
-        if args.stop_after_seen > 0 and seen_streak >= args.stop_after_seen:
-            break
-        if args.max_jobs and args.max_jobs > 0 and len(fresh_jobs) >= args.max_jobs:
-            print(f"  Limite aplicado em detalhe: {len(fresh_jobs)}")
-            break
-        if isinstance(total_api_known, int) and (page + 1) * 25 >= total_api_known:
-            break
-        if len(raw_rows) < 25:
-            break
-        if args.delay > 0:
-            time.sleep(args.delay)
-        page += 1
-
-    print(f"[LINKS] Links unicos: {len(set(all_page_urls))}")
-    print(f"[NEW] Novos links para detalhe: {len(fresh_jobs)}")
+            if total_api_known is None and isinstance(total_api, int):
+                total_api_known = total_api
+
+            if not raw_rows:
+                logger.info("  Pagina %d: 0 registos (fim)", page + 1)
+                break
+
+            logger.info("  Pagina %d: %d registos", page + 1, len(raw_rows))
+            for raw in raw_rows:
+                url = _extract_url(raw)
+                if not url:
+                    continue
+                page_url_append(url)
+
+                if stop_after_seen > 0:
+                    if is_known(url):
+                        seen_streak += 1
+                        if seen_streak >= stop_after_seen:
+                            logger.info("  Paragem incremental: %d links conhecidos em sequencia", seen_streak)
+                            break
+                    else:
+                        seen_streak = 0
+
+                if is_known(url):
+                    continue
+                # So os registos novos pagam o normalize completo.
+                row = normalize(raw, preferred_lang=preferred_lang)
+                if filter_french and not is_french_job(row):
+                    continue
+                if not within_days(row.get("posting_date"), max_days):
+                    continue
+
+                fresh_append(row)
+                if max_jobs and len(fresh_jobs) >= max_jobs:
+                    break
+
+            if stop_after_seen > 0 and seen_streak >= stop_after_seen:
+                break
+            if max_jobs and len(fresh_jobs) >= max_jobs:
+                logger.info("  Limite aplicado em detalhe: %d", len(fresh_jobs))
+                break
+            if isinstance(total_api_known, int) and (page + 1) * 25 >= total_api_known:
+                break
+            if len(raw_rows) < 25:
+                break
+            page += 1
+    finally:
+        for future in pending.values():
+            future.cancel()
+        executor.shutdown(wait=True)
+
+    logger.info("[LINKS] Links unicos: %d", len(set(all_page_urls)))
+    logger.info("[NEW] Novos links para detalhe: %d", len(fresh_jobs))
 
     merged = merge_jobs_by_url(existing_jobs, fresh_jobs)
     filtered = [row for row in merged if within_days(row.get("posting_date"), max_days)]
 
-    seen_now = set(known_urls) | set(all_page_urls) | {
-        str(j.get("url") or "").strip() for j in merged if str(j.get("url") or "").strip()
-    }
+    # known_urls ja nao e usado daqui para a frente: cresce no proprio set, sem copias.
+    seen_now = known_urls
+    seen_now.update(all_page_urls)
+    seen_now.update(j["url"] for j in merged if j.get("url"))
     save_state(
         auto_state_file,
         {
             "last_run_at": datetime.now().isoformat(timespec="seconds"),
-            "seen_urls": sorted(seen_now),
+            **pack_seen_urls(seen_now),
             "output_json": output_json,
             "canton": args.canton,
             "lang": _normalize_lang(args.lang),
         },
     )
-    print(f"[SAVE] Estado incremental salvo: {auto_state_file} ({len(seen_now)} URLs)")
+    logger.info("[SAVE] Estado incremental salvo: %s (%d URLs)", auto_state_file, len(seen_now))
 
     save_json(output_json, filtered)
-    print(f"[SAVE] JSON salvo: {output_json} ({len(filtered)} vagas)")
+    logger.info("[SAVE] JSON salvo: %s (%d vagas)", output_json, len(filtered))
 
     if args.save_csv:
-        csv_name = re.sub(r"\.json$", ".csv", output_json, flags=re.IGNORECASE)
+        csv_name = _JSON_EXT_RE.sub(".csv", output_json)
         if csv_name == output_json:
             csv_name = f"{output_json}.csv"
         save_csv(csv_name, filtered)
-        print(f"[SAVE] CSV salvo: {csv_name}")
+        logger.info("[SAVE] CSV salvo: %s", csv_name)
 
 
 if __name__ == "__main__":
@@ -4,15 +4,32 @@ Pipeline unico: adiciona `professions` em cada registo de vagas.
 """
 
 import argparse
+import hashlib
 import json
 import os
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date
 from pathlib import Path
 from typing import Any
 
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
+
+try:
+    import lxml  # noqa: F401
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 SYSTEM_PROMPT = (
@@ -71,10 +88,61 @@ def find_default_input_and_output(input_arg: str, output_arg: str) -> tuple[Path
 def clean_html_text(raw_html: str | None) -> str:
     if not raw_html:
         return ""
-    text = BeautifulSoup(raw_html, "html.parser").get_text(" ", strip=True)
+    text = BeautifulSoup(raw_html, HTML_PARSER).get_text(" ", strip=True)
     return " ".join(text.split())
 
 
+def write_payload(path: Path, payload: list) -> None:
+    # Escreve ao lado e troca com os.replace: o output nunca fica meio escrito.
+    tmp = path.with_name(f"{path.name}.tmp")
+    if orjson is not None:
+        tmp.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+    else:
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def checkpoint_line(index: int, row: dict) -> bytes:
+    record = {
+        "index": index,
+        "url": row.get("url"),
+        "professions": row.get("professions", ""),
+        "professions_error": row.get("professions_error"),
+    }
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def replay_checkpoint(path: Path, payload: list) -> int:
+    """Reaplica os resultados de uma execucao interrompida; devolve quantos registos repos."""
+    if not path.exists():
+        return 0
+    applied = 0
+    with path.open("rb") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # Ultima linha truncada por uma interrupcao a meio da escrita.
+                continue
+            if not isinstance(rec, dict):
+                continue
+            idx = rec.get("index")
+            if not isinstance(idx, int) or not 0 <= idx < len(payload):
+                continue
+            row = payload[idx]
+            if not isinstance(row, dict) or row.get("url") != rec.get("url"):
+                continue
+            row["professions"] = rec.get("professions") or ""
+            if rec.get("professions_error"):
+                row["professions_error"] = rec["professions_error"]
+            else:
+                row.pop("professions_error", None)
+            applied += 1
+    return applied
+
+
 def ensure_openai_api_key() -> None:
     load_dotenv(Path(".env"))
     if not os.getenv("OPENAI_API_KEY"):
@@ -111,6 +179,54 @@ def classify_professions(client: OpenAI, model: str, title: str, description: st
     return out
 
 
+class ClassificationCache:
+    """Cache local (sqlite) de professions por hash de modelo + titulo + descricao."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache (hash TEXT PRIMARY KEY, professions TEXT)")
+
+    @staticmethod
+    def key(model: str, title: str, description: str) -> str:
+        # Mesmo corte que classify_professions: o modelo so ve os primeiros 4000 caracteres.
+        raw = f"{model}\n{title}\n{description[:4000]}".encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> list[str] | None:
+        found = self.conn.execute("SELECT professions FROM cache WHERE hash = ?", (key,)).fetchone()
+        if not found:
+            return None
+        try:
+            values = json.loads(found[0])
+        except ValueError:
+            return None
+        return values if isinstance(values, list) else None
+
+    def put(self, key: str, professions: list[str]) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (hash, professions) VALUES (?, ?)",
+            (key, json.dumps(professions, ensure_ascii=False)),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def classify_with_retry(
+    client: OpenAI, model: str, title: str, description: str, retries: int = 5
+) -> list[str]:
+    for attempt in range(retries):
+        try:
+            return classify_professions(client, model, title, description)
+        except RateLimitError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(min(60, 2**attempt) + random.random())
+    return []
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Adiciona professions em cada registo do JSON de vagas (pipeline unico)."
@@ -130,9 +246,16 @@ def main() -> None:
     parser.add_argument(
         "--checkpoint-every",
         type=int,
-        default=1,
-        help="Guarda progresso no output a cada N registos (default: 1).",
+        default=10,
+        help="Forca a escrita do checkpoint NDJSON a cada N registos (default: 10).",
     )
+    parser.add_argument("--workers", type=int, default=8, help="Pedidos OpenAI em paralelo (default: 8).")
+    parser.add_argument(
+        "--cache-file",
+        default="",
+        help="Cache sqlite de classificacoes (default: classify_cache.sqlite ao lado do output).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Nao usa o cache de classificacoes.")
     parser.add_argument("--force-all", action="store_true", help="Reprocessa todos os registos.")
     parser.add_argument("--retry-errors", action="store_true", help="Tambem reprocessa registos com erro.")
     args = parser.parse_args()
@@ -141,10 +264,21 @@ def main() -> None:
     in_path, out_path = find_default_input_and_output(args.input, args.output)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    payload = json.loads(in_path.read_text(encoding="utf-8"))
+    raw_input = in_path.read_bytes()
+    payload = orjson.loads(raw_input) if orjson is not None else json.loads(raw_input.decode("utf-8"))
     if not isinstance(payload, list):
         raise RuntimeError("O JSON de entrada deve ser uma lista de registos.")
 
+    checkpoint_path = out_path.with_name(f"{out_path.name}.ndjson.tmp")
+    resumed = replay_checkpoint(checkpoint_path, payload)
+    if resumed:
+        print(f"[RESUME] {resumed} registos recuperados de {checkpoint_path}")
+
+    cache = None
+    if not args.no_cache:
+        cache_path = Path(args.cache_file) if args.cache_file else out_path.with_name("classify_cache.sqlite")
+        cache = ClassificationCache(cache_path)
+
     client = OpenAI()
     total = len(payload)
     log_path = Path(args.log_file) if args.log_file else None
@@ -156,8 +290,20 @@ def main() -> None:
             with log_path.open("a", encoding="utf-8") as f:
                 f.write(message + "\n")
 
+    checkpoint = checkpoint_path.open("ab")
+    pending_flush = 0
+
+    def record(i: int, row: dict) -> None:
+        nonlocal pending_flush
+        checkpoint.write(checkpoint_line(i - 1, row))
+        pending_flush += 1
+        if pending_flush >= max(1, args.checkpoint_every):
+            checkpoint.flush()
+            pending_flush = 0
+
     processed = 0
     skipped = 0
+    todo: list[tuple[int, dict, str, str]] = []
     for i, row in enumerate(payload, start=1):
         if not isinstance(row, dict):
             continue
@@ -180,24 +326,67 @@ def main() -> None:
         description = clean_html_text(row.get("description"))
         if not title and not description:
             row["professions"] = ""
+            record(i, row)
             write_log(f"[{i}/{total}] professions=")
             processed += 1
             continue
+        todo.append((i, row, title, description))
 
-        try:
-            profs = classify_professions(client, args.model, title, description)
-            row["professions"] = ", ".join(profs)
+    # Registos com o mesmo titulo+descricao partilham um unico pedido; os que ja estao
+    # no cache nem chegam a ser enviados. Com --force-all o cache so e escrito: tudo e
+    # reclassificado e os resultados novos substituem os antigos.
+    groups: dict[str, list[tuple[int, dict]]] = {}
+    jobs: dict[str, tuple[str, str]] = {}
+    for i, row, title, description in todo:
+        key = ClassificationCache.key(args.model, title, description)
+        cached = cache.get(key) if cache is not None and not args.force_all else None
+        if cached is not None:
+            row["professions"] = ", ".join(cached)
             row.pop("professions_error", None)
-        except Exception as exc:
-            row["professions"] = ""
-            row["professions_error"] = f"{type(exc).__name__}: {exc}"
+            record(i, row)
+            write_log(f"[{i}/{total}] professions={row['professions']} (cache)")
+            processed += 1
+            continue
+        groups.setdefault(key, []).append((i, row))
+        jobs.setdefault(key, (title, description))
+
+    # As linhas sao alteradas no proprio payload e o checkpoint e escrito nesta thread;
+    # cada linha NDJSON leva o indice, por isso a ordem de conclusao nao importa.
+    with checkpoint, ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures: dict = {}
+        try:
+            for key, (title, description) in jobs.items():
+                futures[executor.submit(classify_with_retry, client, args.model, title, description)] = key
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    profs = future.result()
+                    error = None
+                except Exception as exc:
+                    profs = []
+                    error = f"{type(exc).__name__}: {exc}"
+                if error is None and cache is not None:
+                    cache.put(key, profs)
 
-        write_log(f"[{i}/{total}] professions={row['professions']}")
-        processed += 1
-        if args.checkpoint_every > 0 and i % args.checkpoint_every == 0:
-            out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+                for i, row in groups[key]:
+                    row["professions"] = ", ".join(profs)
+                    if error is None:
+                        row.pop("professions_error", None)
+                    else:
+                        row["professions_error"] = error
+                    record(i, row)
+                    write_log(f"[{i}/{total}] professions={row['professions']}")
+                    processed += 1
+        except BaseException:
+            # Erro ou Ctrl-C: cancela os pedidos ainda em fila em vez de os enviar (e pagar)
+            # todos no shutdown(wait=True) do with; so os que ja estao a correr terminam.
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
 
-    out_path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    if cache is not None:
+        cache.close()
+    write_payload(out_path, payload)
+    checkpoint_path.unlink(missing_ok=True)
     print(
         f"[DONE] Registos totais: {total} | processados: {processed} | ignorados: {skipped} | output: {out_path}"
     )
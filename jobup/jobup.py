@@ -7,18 +7,47 @@ import argparse
 import builtins
 import csv
 import json
+import os
 import re
+import sys
+import threading
 import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from html import unescape
+from itertools import pairwise
+from operator import itemgetter
 from pathlib import Path
 from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from lxml import etree as lxml_etree
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    lxml_etree = None
+    HTML_PARSER = "html.parser"
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as FastHTMLParser
+except ImportError:
+    FastHTMLParser = None
 
 BASE_URL = "https://www.jobup.ch/fr/emplois/"
 DETAIL_HOST = "www.jobup.ch"
+DETAIL_BASE = f"https://{DETAIL_HOST}"
+_DETAIL_PREFIX = f"{DETAIL_BASE}/"
 DEFAULT_HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -27,12 +56,50 @@ DEFAULT_HEADERS = {
     "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
 }
 
+# Sem selectolax nem lxml, o BeautifulSoup só materializa os links.
+_A_STRAINER = SoupStrainer("a", href=True)
+
+# Os blocos ld+json e as tags og:* são regulares: um só regex apanha ambos sem montar o DOM.
+_PAGE_RE = re.compile(
+    r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>'
+    r'|<meta[^>]+property=["\'](og:[^"\']+)["\'][^>]+content=["\']([^"\']+)["\']',
+    re.IGNORECASE | re.DOTALL,
+)
+_TOTAL_PAGES_RES = (
+    re.compile(r'"totalPages"\s*:\s*(\d+)'),
+    re.compile(r'"total_pages"\s*:\s*(\d+)'),
+)
+_WS_RE = re.compile(r"\s+")
+# O @type é comparado sem maiúsculas mais abaixo, por isso o pré-filtro também o é.
+_JOBPOSTING_RE = re.compile(r"jobposting", re.IGNORECASE)
+_JSON_EXT_RE = re.compile(r"\.json$", re.IGNORECASE)
+
+# O master cresce por append num journal JSONL; é reescrito quando o journal passa esta fração.
+MASTER_COMPACT_RATIO = 0.5
+
 
 def print(*args, **kwargs):  # type: ignore[override]
     kwargs.setdefault("flush", True)
     return builtins.print(*args, **kwargs)
 
 
+def build_session(pool_size: int = 32) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers["Connection"] = "keep-alive"
+    # raise_on_status=False: esgotadas as tentativas, o 403/429/5xx chega ao código de paragem segura.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def build_search_url(location: str, term: str = "", page: int = 1) -> str:
     params = {"location": location}
     if term.strip():
@@ -52,12 +119,20 @@ def set_page_param(url: str, page: int) -> str:
     return urlunparse(parsed._replace(query=urlencode(query)))
 
 
+PAGE_PLACEHOLDER = "__PAGE__"
+
+
+def page_url_template(url: str) -> str:
+    """URL com `page=__PAGE__`: a paginação só troca o número, sem voltar a fazer parse da query."""
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query, keep_blank_values=True))
+    query["page"] = PAGE_PLACEHOLDER
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
 def extract_total_pages(html: str) -> int | None:
-    for pattern in (
-        r'"totalPages"\s*:\s*(\d+)',
-        r'"total_pages"\s*:\s*(\d+)',
-    ):
-        match = re.search(pattern, html)
+    for pattern in _TOTAL_PAGES_RES:
+        match = pattern.search(html)
         if match:
             return max(1, int(match.group(1)))
     return None
@@ -71,106 +146,179 @@ def _is_job_detail_url(url: str) -> bool:
     return parsed.netloc.lower().endswith("jobup.ch") and "/emplois/detail/" in parsed.path
 
 
-def extract_detail_links(html: str) -> list[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    links = soup.select("a[href]")
-    out: list[str] = []
+def _drain_hrefs(parser):
+    for event, el in parser.read_events():
+        if event == "start":
+            if el.tag == "a":
+                yield el.get("href")
+            continue
+        # Elemento fechado: já não é preciso. Limpa-o e solta os irmãos anteriores, para
+        # a árvore do pull parser ficar com pouco mais do que o caminho aberto até ao nó atual.
+        el.clear()
+        parent = el.getparent()
+        if parent is not None:
+            while el.getprevious() is not None:
+                del parent[0]
+
+
+def _iter_hrefs_streaming(html: str, chunk_size: int = 65536):
+    # Os blocos limitam quanto da árvore existe entre duas leituras de eventos:
+    # alimentar a página toda de uma vez construiria o DOM inteiro antes do primeiro href.
+    parser = lxml_etree.HTMLPullParser(events=("start", "end"))
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start : start + chunk_size])
+        yield from _drain_hrefs(parser)
+    parser.close()
+    yield from _drain_hrefs(parser)
+
+
+def _iter_hrefs(html: str):
+    if FastHTMLParser is not None:
+        for node in FastHTMLParser(html).css("a[href]"):
+            yield node.attributes.get("href")
+        return
+    if lxml_etree is not None:
+        yield from _iter_hrefs_streaming(html)
+        return
+    for link in BeautifulSoup(html, HTML_PARSER, parse_only=_A_STRAINER).select("a[href]"):
+        yield link.get("href")
+
+
+def iter_detail_links(html: str) -> Iterator[str]:
+    """Links de detalhe únicos, pela ordem da página, emitidos à medida que são lidos."""
     seen: set[str] = set()
 
-    for link in links:
-        href = (link.get("href") or "").strip()
+    for href in _iter_hrefs(html):
+        href = (href or "").strip()
         if not href:
             continue
-        full = urljoin(f"https://{DETAIL_HOST}", href).split("#")[0]
-        if not _is_job_detail_url(full):
+        full = urljoin(DETAIL_BASE, href).split("#")[0]
+        # Caminho rápido: URLs do próprio host dispensam o urlparse (o path acaba no "?").
+        if full.startswith(_DETAIL_PREFIX):
+            if "/emplois/detail/" not in full[len(DETAIL_BASE) :].partition("?")[0]:
+                continue
+        elif not _is_job_detail_url(full):
             continue
+        full = sys.intern(full)
         if full in seen:
             continue
         seen.add(full)
-        out.append(full)
-    return out
+        yield full
+
+
+def extract_detail_links(html: str) -> list[str]:
+    return list(iter_detail_links(html))
 
 
 def _clean_text(value: str | None, limit: int = 800) -> str | None:
     if not value:
         return None
     value = unescape(value)
-    value = re.sub(r"\s+", " ", value).strip()
+    value = _WS_RE.sub(" ", value).strip()
     if not value:
         return None
     return value[:limit]
 
 
 def _collect_ldjson_nodes(obj: object) -> list[dict]:
+    # Pilha explícita em vez de recursão; os filhos entram por ordem inversa para manter a pré-ordem
+    # (o primeiro JobPosting encontrado continua a ser o mesmo).
     out: list[dict] = []
-    if isinstance(obj, dict):
-        out.append(obj)
-        for key in ("@graph", "graph", "itemListElement"):
-            child = obj.get(key)
-            if isinstance(child, list):
-                for it in child:
-                    out.extend(_collect_ldjson_nodes(it))
-            elif isinstance(child, dict):
-                out.extend(_collect_ldjson_nodes(child))
-    elif isinstance(obj, list):
-        for it in obj:
-            out.extend(_collect_ldjson_nodes(it))
+    stack = [obj]
+    while stack:
+        cur = stack.pop()
+        if isinstance(cur, dict):
+            out.append(cur)
+            for key in ("itemListElement", "graph", "@graph"):
+                child = cur.get(key)
+                if isinstance(child, (list, dict)):
+                    stack.append(child)
+        elif isinstance(cur, list):
+            stack.extend(reversed(cur))
     return out
 
 
-def _extract_from_ldjson(html: str) -> dict:
-    soup = BeautifulSoup(html, "html.parser")
-    scripts = soup.select('script[type="application/ld+json"]')
-    for script in scripts:
-        raw = (script.string or script.get_text() or "").strip()
-        if not raw:
-            continue
-        try:
-            payload = json.loads(raw)
-        except Exception:
+def _parse_ldjson_block(raw: str) -> dict | None:
+    raw = raw.strip()
+    if not raw:
+        return None
+    # BreadcrumbList/Organization/WebSite não precisam de json.loads nem do percurso.
+    if not _JOBPOSTING_RE.search(raw):
+        return None
+    try:
+        payload = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except Exception:
+        return None
+    for node in _collect_ldjson_nodes(payload):
+        if str(node.get("@type") or "").lower() != "jobposting":
             continue
-        for node in _collect_ldjson_nodes(payload):
-            if str(node.get("@type") or "").lower() != "jobposting":
-                continue
-            company = None
-            org = node.get("hiringOrganization")
-            if isinstance(org, dict):
-                company = org.get("name")
-
-            location = None
-            loc = node.get("jobLocation")
-            if isinstance(loc, dict):
-                addr = loc.get("address")
-                if isinstance(addr, dict):
-                    location = addr.get("addressLocality") or addr.get("addressRegion")
-
-            return {
-                "title": _clean_text(node.get("title"), 180),
-                "company": _clean_text(company, 140),
-                "location": _clean_text(location, 120),
-                "description": _clean_text(node.get("description"), 1200),
-                "posting_date": _clean_text(node.get("datePosted"), 32),
-            }
-    return {}
-
-
-def _extract_meta(html: str, prop: str) -> str | None:
-    match = re.search(
-        rf'<meta[^>]+property=["\']{re.escape(prop)}["\'][^>]+content=["\']([^"\']+)["\']',
-        html,
-        flags=re.IGNORECASE,
-    )
-    return match.group(1).strip() if match else None
+        company = None
+        org = node.get("hiringOrganization")
+        if isinstance(org, dict):
+            company = org.get("name")
+
+        location = None
+        loc = node.get("jobLocation")
+        if isinstance(loc, dict):
+            addr = loc.get("address")
+            if isinstance(addr, dict):
+                location = addr.get("addressLocality") or addr.get("addressRegion")
+
+        return {
+            "title": _clean_text(node.get("title"), 180),
+            "company": _clean_text(company, 140),
+            "location": _clean_text(location, 120),
+            "description": _clean_text(node.get("description"), 1200),
+            "posting_date": _clean_text(node.get("datePosted"), 32),
+        }
+    return None
 
 
-def fetch_detail(session: requests.Session, url: str, timeout: int = 30) -> dict:
-    response = session.get(url, timeout=timeout)
+def _extract_page(html: str) -> tuple[dict, dict[str, str]]:
+    """Uma só passagem pelo HTML: primeiro JobPosting do ld+json e tags og:* (chave em minúsculas)."""
+    ld: dict = {}
+    og: dict[str, str] = {}
+    for match in _PAGE_RE.finditer(html):
+        script = match.group(1)
+        if script is not None:
+            if not ld:
+                ld = _parse_ldjson_block(script) or {}
+            continue
+        og.setdefault(match.group(2).lower(), match.group(3).strip())
+    return ld, og
+
+
+def fetch_detail(
+    session: requests.Session,
+    url: str,
+    timeout: int = 30,
+    validators: dict[str, list] | None = None,
+) -> dict | None:
+    """
+    Com `validators` ({url: [etag, last_modified]}) faz um GET condicional e devolve None
+    quando a página não mudou (304). O dict é atualizado com os validadores da resposta.
+    """
+    headers: dict[str, str] = {}
+    if validators is not None:
+        etag, last_modified = validators.get(url) or (None, None)
+        if etag:
+            headers["If-None-Match"] = str(etag)
+        if last_modified:
+            headers["If-Modified-Since"] = str(last_modified)
+    response = session.get(url, timeout=timeout, headers=headers)
+    if response.status_code == 304:
+        return None
     response.raise_for_status()
+    if validators is not None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            validators[url] = [etag, last_modified]
     html = response.text
 
-    ld = _extract_from_ldjson(html)
-    title = ld.get("title") or _clean_text(_extract_meta(html, "og:title"), 180)
-    description = ld.get("description") or _clean_text(_extract_meta(html, "og:description"), 1200)
+    ld, og = _extract_page(html)
+    title = ld.get("title") or _clean_text(og.get("og:title"), 180)
+    description = ld.get("description") or _clean_text(og.get("og:description"), 1200)
 
     posting_date = (ld.get("posting_date") or "").strip()
     if posting_date and "T" in posting_date:
@@ -187,24 +335,80 @@ def fetch_detail(session: requests.Session, url: str, timeout: int = 30) -> dict
     }
 
 
-def within_days(posting_date: str | None, max_days: int | None) -> bool:
+class RateLimiter:
+    """Garante um intervalo mínimo entre pedidos, partilhado entre threads."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = max(0.0, interval)
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Resposta 304 de uma vaga revalidada: o registo guardado continua atual.
+NOT_MODIFIED: dict = {}
+
+
+def _fetch_detail_safe(
+    session: requests.Session,
+    url: str,
+    limiter: RateLimiter,
+    validators: dict[str, list] | None,
+) -> dict | None:
+    limiter.wait()
+    try:
+        job = fetch_detail(session, url, validators=validators)
+    except Exception:
+        return None
+    return NOT_MODIFIED if job is None else job
+
+
+def within_days(posting_date: str | None, max_days: int | None, today: date | None = None) -> bool:
     if max_days is None:
         return True
     if not posting_date:
         return False
     try:
-        day = datetime.fromisoformat(posting_date).date()
+        # fetch_detail já normaliza para YYYY-MM-DD; o resto (dados antigos) vai pelo fromisoformat.
+        if len(posting_date) == 10 and posting_date[4] == "-" and posting_date[7] == "-":
+            day = date(int(posting_date[:4]), int(posting_date[5:7]), int(posting_date[8:]))
+        else:
+            day = datetime.fromisoformat(posting_date).date()
     except ValueError:
         return False
-    age = (date.today() - day).days
+    age = ((today or date.today()) - day).days
     return 0 <= age <= max_days
 
 
+def _dump_json(p: Path, payload: object) -> None:
+    # Escreve ao lado e troca com os.replace: o ficheiro nunca fica meio escrito.
+    tmp = p.with_name(f"{p.name}.tmp")
+    if orjson is not None:
+        tmp.write_bytes(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, p)
+
+
+def _read_json(p: Path):
+    raw = p.read_bytes()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw.decode("utf-8"))
+
+
 def save_json(path: str, jobs: list[dict]) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    with p.open("w", encoding="utf-8") as f:
-        json.dump(jobs, f, ensure_ascii=False, indent=2)
+    _dump_json(p, jobs)
 
 
 def save_csv(path: str, jobs: list[dict]) -> None:
@@ -212,10 +416,9 @@ def save_csv(path: str, jobs: list[dict]) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
     with p.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        for job in jobs:
-            writer.writerow({k: job.get(k) for k in fields})
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        writer.writerows([job.get(k) for k in fields] for job in jobs)
 
 
 def load_json_jobs(path: str) -> list[dict]:
@@ -223,7 +426,7 @@ def load_json_jobs(path: str) -> list[dict]:
     if not p.exists():
         return []
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        data = _read_json(p)
     except Exception:
         return []
     if not isinstance(data, list):
@@ -236,7 +439,7 @@ def load_state(path: str) -> dict:
     if not p.exists():
         return {}
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        data = _read_json(p)
     except Exception:
         return {}
     return data if isinstance(data, dict) else {}
@@ -245,24 +448,80 @@ def load_state(path: str) -> dict:
 def save_state(path: str, payload: dict) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    _dump_json(p, payload)
+
+
+def master_journal_path(master_file: str) -> Path:
+    p = Path(master_file)
+    return p.with_name(f"{p.stem}.jsonl")
+
+
+def save_jsonl_append(path: Path, jobs: list[dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("ab") as f:
+        for job in jobs:
+            if orjson is not None:
+                f.write(orjson.dumps(job, option=orjson.OPT_NON_STR_KEYS) + b"\n")
+            else:
+                f.write((json.dumps(job, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+def load_master_jobs(master_file: str) -> tuple[list[dict], int]:
+    """Base mestre + journal JSONL reaplicado por URL; devolve também o nº de linhas do journal."""
+    jobs = load_json_jobs(master_file)
+    journal = master_journal_path(master_file)
+    if not journal.exists():
+        return jobs, 0
+
+    by_url: dict[str, dict] = {}
+    no_url: list[dict] = []
+    for job in jobs:
+        url = _url_of(job)
+        if url:
+            by_url[url] = job
+        else:
+            no_url.append(job)
+
+    lines = 0
+    with journal.open("rb") as f:
+        for line in f:
+            try:
+                job = orjson.loads(line) if orjson is not None else json.loads(line)
+            except ValueError:
+                # Última linha truncada por uma interrupção a meio da escrita.
+                continue
+            if not isinstance(job, dict) or not (url := _url_of(job)):
+                continue
+            by_url[url] = job
+            lines += 1
+    return [*by_url.values(), *no_url], lines
+
+
+def _url_of(job: dict) -> str:
+    url = job.get("url")
+    if isinstance(url, str):
+        return url.strip()
+    return str(url).strip() if url else ""
 
 
 def merge_jobs_by_url(current: list[dict], fresh: list[dict]) -> list[dict]:
     merged: dict[str, dict] = {}
+    missing_id = False
     max_id = 0
 
     for job in current:
         raw_id = job.get("id")
-        if isinstance(raw_id, int) and raw_id > max_id:
+        has_id = isinstance(raw_id, int)
+        if has_id and raw_id > max_id:
             max_id = raw_id
-    for job in current:
-        url = str(job.get("url") or "").strip()
+        url = _url_of(job)
         if not url:
             continue
         merged[url] = job
+        missing_id = missing_id or not has_id
+
     for job in fresh:
-        url = str(job.get("url") or "").strip()
+        url = _url_of(job)
         if not url:
             continue
         existing = merged.get(url)
@@ -273,14 +532,16 @@ def merge_jobs_by_url(current: list[dict], fresh: list[dict]) -> list[dict]:
             job["id"] = max_id
         merged[url] = job
 
-    # Garante id para registos antigos que possam não ter id.
-    for job in merged.values():
-        if not isinstance(job.get("id"), int):
-            max_id += 1
-            job["id"] = max_id
-    out = list(merged.values())
+    # Garante id para registos antigos que possam não ter id (raro: só se percorre quando preciso).
+    if missing_id:
+        for job in merged.values():
+            if not isinstance(job.get("id"), int):
+                max_id += 1
+                job["id"] = max_id
 
-    out.sort(key=lambda job: int(job.get("id")) if isinstance(job.get("id"), int) else 0, reverse=True)
+    out = list(merged.values())
+    if any(a["id"] < b["id"] for a, b in pairwise(out)):
+        out.sort(key=itemgetter("id"), reverse=True)
     return out
 
 
@@ -299,7 +560,15 @@ def main() -> None:
         "--master-file",
         type=str,
         default="jobup_jobs_master.json",
-        help="Base mestre de vagas no modo incremental",
+        help=(
+            "Base mestre de vagas no modo incremental. As vagas novas vão para o journal "
+            "<stem>.jsonl ao lado; o JSON só é reescrito na compactação (ou com --compact)"
+        ),
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="No incremental, reescreve já a base mestre e descarta o journal JSONL",
     )
     parser.add_argument(
         "--stop-after-seen",
@@ -314,13 +583,20 @@ def main() -> None:
         help="Ficheiro JSON de saída (default: data/jobup/professions.json)",
     )
     parser.add_argument("--save-csv", action="store_true", help="Também salva CSV")
+    parser.add_argument("--workers", type=int, default=8, help="Pedidos de detalhe em paralelo")
+    parser.add_argument(
+        "--refresh-known",
+        type=int,
+        default=0,
+        help="Revalida até N vagas já guardadas vistas nesta pesquisa, com GET condicional (0 desativa)",
+    )
     args = parser.parse_args()
 
     output_json = args.output_json.strip() or str(Path("data") / "jobup" / "professions.json")
     output_path = Path(output_json)
     auto_state_file = str(output_path.with_name(f"{output_path.stem}.state.json"))
     existing_jobs = load_json_jobs(output_json)
-    known_urls = {str(j.get("url") or "").strip() for j in existing_jobs if str(j.get("url") or "").strip()}
+    known_urls = {u for j in existing_jobs if (u := _url_of(j))}
     auto_state = load_state(auto_state_file)
     auto_state_urls = auto_state.get("seen_urls") if isinstance(auto_state, dict) else []
     if isinstance(auto_state_urls, list):
@@ -331,8 +607,7 @@ def main() -> None:
             f"(dados + estado: {auto_state_file})"
         )
 
-    session = requests.Session()
-    session.headers.update(DEFAULT_HEADERS)
+    session = build_session(pool_size=max(32, args.workers))
 
     page1_url = args.url.strip() or build_search_url(location=args.location, term=args.term, page=1)
     print(f"[SEARCH] Página base: {page1_url}")
@@ -368,15 +643,16 @@ def main() -> None:
     known_streak = 0
 
     if args.incremental:
-        master_jobs = load_json_jobs(args.master_file)
-        known_urls_state = {str(j.get("url") or "").strip() for j in master_jobs if str(j.get("url") or "").strip()}
+        master_jobs, journal_lines = load_master_jobs(args.master_file)
+        known_urls_state = {u for j in master_jobs if (u := _url_of(j))}
         state = load_state(args.state_file)
         state_urls = state.get("seen_urls") or []
         if isinstance(state_urls, list):
             known_urls_state.update(str(x).strip() for x in state_urls if str(x).strip())
         print(f"  Incremental legacy: {len(known_urls_state)} links já conhecidos")
 
-    combined_known = set(known_urls) | set(known_urls_state)
+    # Só é consultado no ciclo de paginação: frozenset com URLs internados, como os de extract_detail_links.
+    combined_known = frozenset(map(sys.intern, known_urls | known_urls_state))
 
     def fetch_search_page(url: str) -> tuple[str | None, bool]:
         try:
@@ -394,6 +670,7 @@ def main() -> None:
 
         return resp.text, False
 
+    page_template = page_url_template(page1_url)
     page1_links = extract_detail_links(html) if html else []
     print(f"  Página 1: {len(page1_links)} links")
     for link in page1_links:
@@ -404,15 +681,17 @@ def main() -> None:
     if total_pages is not None:
         page_iter = range(2, total_pages + 1)
         for page in page_iter:
-            url = set_page_param(page1_url, page)
+            url = page_template.replace(PAGE_PLACEHOLDER, str(page))
             page_html, should_stop = fetch_search_page(url)
             if should_stop:
                 break
             if not page_html:
                 break
-            page_links = extract_detail_links(page_html)
-            print(f"  Página {page}: {len(page_links)} links")
+            # Gerador: ao atingir o stop-after-seen o resto da página já não é lido.
+            page_links = iter_detail_links(page_html)
+            page_count = 0
             for link in page_links:
+                page_count += 1
                 if link in seen_links:
                     continue
                 seen_links.add(link)
@@ -421,30 +700,28 @@ def main() -> None:
                     if link in combined_known:
                         known_streak += 1
                         if known_streak >= args.stop_after_seen:
-                            print(f"  Paragem incremental: {known_streak} links conhecidos em sequência")
-                            page_links = []
                             break
                     else:
                         known_streak = 0
+            print(f"  Página {page}: {page_count} links")
             if args.stop_after_seen > 0 and known_streak >= args.stop_after_seen:
+                print(f"  Paragem incremental: {known_streak} links conhecidos em sequência")
                 break
             if args.delay > 0:
                 time.sleep(args.delay)
     else:
         max_dynamic_pages = args.max_pages if args.max_pages and args.max_pages > 0 else 200
         for page in range(2, max_dynamic_pages + 1):
-            url = set_page_param(page1_url, page)
+            url = page_template.replace(PAGE_PLACEHOLDER, str(page))
             page_html, should_stop = fetch_search_page(url)
             if should_stop:
                 break
             if not page_html:
                 break
-            page_links = extract_detail_links(page_html)
-            if not page_links:
-                print(f"  Página {page}: 0 links (fim)")
-                break
-            print(f"  Página {page}: {len(page_links)} links")
+            page_links = iter_detail_links(page_html)
+            page_count = 0
             for link in page_links:
+                page_count += 1
                 if link in seen_links:
                     continue
                 seen_links.add(link)
@@ -453,12 +730,15 @@ def main() -> None:
                     if link in combined_known:
                         known_streak += 1
                         if known_streak >= args.stop_after_seen:
-                            print(f"  Paragem incremental: {known_streak} links conhecidos em sequência")
-                            page_links = []
                             break
                     else:
                         known_streak = 0
+            if not page_count:
+                print(f"  Página {page}: 0 links (fim)")
+                break
+            print(f"  Página {page}: {page_count} links")
             if args.stop_after_seen > 0 and known_streak >= args.stop_after_seen:
+                print(f"  Paragem incremental: {known_streak} links conhecidos em sequência")
                 break
             if args.delay > 0:
                 time.sleep(args.delay)
@@ -476,25 +756,60 @@ def main() -> None:
     fetched_jobs: list[dict] = []
     max_days = args.days if args.days and args.days > 0 else None
 
-    for idx, link in enumerate(detail_links, start=1):
-        try:
-            job = fetch_detail(session, link)
-        except Exception:
-            continue
-        fetched_jobs.append(job)
-        if idx % 25 == 0:
-            print(f"  Detalhes processados: {idx}/{len(detail_links)}")
-        if args.delay > 0:
-            time.sleep(args.delay)
+    # A pesquisa continua em série (stop-after-seen); os detalhes são independentes.
+    # executor.map devolve pela ordem de detail_links, o que mantém os ids estáveis.
+    # O --delay passa a ser o intervalo global entre pedidos, não uma pausa por worker.
+    limiter = RateLimiter(args.delay)
+    raw_validators = auto_state.get("validators") if isinstance(auto_state, dict) else None
+    validators: dict[str, list] = {}
+    if isinstance(raw_validators, dict):
+        validators = {u: v for u, v in raw_validators.items() if isinstance(v, list) and len(v) == 2}
+
+    # Os links conhecidos nunca voltam ao detalhe por si; --refresh-known revalida alguns dos
+    # que reapareceram na pesquisa. Um 304 mantém o registo guardado, um 200 substitui-o (mesmo id).
+    refresh_links: list[str] = []
+    if args.refresh_known > 0:
+        stored_urls = {u for j in (*existing_jobs, *master_jobs) if (u := _url_of(j))}
+        refresh_links = [u for u in unique_links if u in stored_urls][: args.refresh_known]
+        print(f"[REFRESH] Vagas guardadas a revalidar: {len(refresh_links)}")
+    fetch_links = detail_links + refresh_links
+    unchanged = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        # Sem --refresh-known não há onde usar validadores: nem se enviam nem se recolhem.
+        link_validators = validators if args.refresh_known > 0 else None
+        details = executor.map(
+            lambda link: _fetch_detail_safe(session, link, limiter, link_validators),
+            fetch_links,
+        )
+        for idx, job in enumerate(details, start=1):
+            if job is None:
+                continue
+            if job is NOT_MODIFIED:
+                unchanged += 1
+                continue
+            fetched_jobs.append(job)
+            if idx % 25 == 0:
+                print(f"  Detalhes processados: {idx}/{len(fetch_links)}")
+    if refresh_links:
+        print(f"[REFRESH] Sem alterações (304): {unchanged}")
 
     if args.incremental:
         merged_master = merge_jobs_by_url(master_jobs, fetched_jobs)
-        save_json(args.master_file, merged_master)
+        # Só os registos novos vão para o journal; a reescrita completa fica para a compactação.
+        journal = master_journal_path(args.master_file)
+        new_master_jobs = [j for j in fetched_jobs if _url_of(j)]
+        journal_lines += len(new_master_jobs)
+        if args.compact or journal_lines > len(merged_master) * MASTER_COMPACT_RATIO:
+            save_json(args.master_file, merged_master)
+            journal.unlink(missing_ok=True)
+        else:
+            save_jsonl_append(journal, new_master_jobs)
         save_state(
             args.state_file,
             {
                 "last_run_at": datetime.now().isoformat(timespec="seconds"),
-                "seen_urls": [str(j.get("url") or "").strip() for j in merged_master if str(j.get("url") or "").strip()],
+                "seen_urls": [u for j in merged_master if (u := _url_of(j))],
                 "master_file": args.master_file,
             },
         )
@@ -505,25 +820,30 @@ def main() -> None:
 
     # Guarda estado de URLs vistas para acelerar futuras execuções
     # mesmo quando output_json está filtrado por dias.
-    seen_now = set(known_urls) | set(unique_links) | {
-        str(j.get("url") or "").strip() for j in base_jobs if str(j.get("url") or "").strip()
-    }
+    # known_urls já não é usado daqui para a frente: cresce no próprio set, sem cópias.
+    seen_now = known_urls
+    seen_now.update(unique_links)
+    stored_now = {u for j in base_jobs if (u := _url_of(j))}
+    seen_now.update(stored_now)
     save_state(
         auto_state_file,
         {
             "last_run_at": datetime.now().isoformat(timespec="seconds"),
             "seen_urls": sorted(seen_now),
             "output_json": output_json,
+            # Só vagas com registo guardado: são as únicas que o --refresh-known revalida.
+            "validators": {u: v for u, v in validators.items() if u in stored_now},
         },
     )
     print(f"[SAVE] Estado incremental salvo: {auto_state_file} ({len(seen_now)} URLs)")
 
-    filtered_jobs = [job for job in base_jobs if within_days(job.get("posting_date"), max_days)]
+    today = date.today()
+    filtered_jobs = [job for job in base_jobs if within_days(job.get("posting_date"), max_days, today)]
     save_json(output_json, filtered_jobs)
     print(f"[SAVE] JSON salvo: {output_json} ({len(filtered_jobs)} vagas)")
 
     if args.save_csv:
-        csv_name = re.sub(r"\.json$", ".csv", output_json, flags=re.IGNORECASE)
+        csv_name = _JSON_EXT_RE.sub(".csv", output_json)
         if csv_name == output_json:
             csv_name = f"{output_json}.csv"
         save_csv(csv_name, filtered_jobs)
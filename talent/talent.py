@@ -6,16 +6,43 @@ Scraper de vagas Talent.com (Genève) com incremental automático.
 import argparse
 import builtins
 import csv
+import gzip
+import hashlib
 import json
+import os
 import re
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from html import unescape
+from operator import itemgetter
 from pathlib import Path
 from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from lxml import etree as lxml_etree
+
+    HTML_PARSER = "lxml"
+except ImportError:
+    lxml_etree = None
+    HTML_PARSER = "html.parser"
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as FastHTMLParser
+except ImportError:
+    FastHTMLParser = None
 
 BASE_URL = "https://ch.talent.com/fr/jobs"
 DETAIL_HOST = "ch.talent.com"
@@ -27,12 +54,47 @@ DEFAULT_HEADERS = {
     "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
 }
 
+# Sem selectolax, o BeautifulSoup só materializa as tags que cada extrator lê.
+_A_STRAINER = SoupStrainer("a", href=True)
+_LD_STRAINER = SoupStrainer("script", attrs={"type": "application/ld+json"})
+
+_PAGE_RE = re.compile(r"[?&]p=(\d+)")
+# Equivalente a urlparse: netloc termina em talent.com, path termina em /view
+# (";params" do último segmento à parte) e "id=" aparece na query.
+_JOB_DETAIL_RE = re.compile(
+    r"(?:[A-Za-z][A-Za-z0-9+.-]*:)?//[^/?#]*(?i:talent\.com)/(?:[^?#]*/)?view(?:;[^/?#]*)?\?[^#]*id="
+)
+_TOKEN_RE = re.compile(r"[a-zàâçéèêëîïôûùüÿñæœ]{3,}")
+# Texto só ASCII: tudo o que não é a-z vira espaço e basta um split (mais rápido que o regex).
+_ASCII_SEPARATORS = str.maketrans({chr(c): " " for c in range(128) if not "a" <= chr(c) <= "z"})
+_WS_RE = re.compile(r"\s+")
+_JSON_EXT_RE = re.compile(r"\.json$", re.IGNORECASE)
+_LDJSON_RE = re.compile(rb"<script[^>]+application/ld\+json[^>]*>(.*?)</script>", re.DOTALL | re.IGNORECASE)
+
 
 def print(*args, **kwargs):  # type: ignore[override]
     kwargs.setdefault("flush", True)
     return builtins.print(*args, **kwargs)
 
 
+def build_session(pool_size: int = 8) -> requests.Session:
+    # Uma pool por host com keep-alive: os workers de detalhe reutilizam as ligações TLS.
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers["Connection"] = "keep-alive"
+    # raise_on_status=False: esgotadas as tentativas, o erro chega ao raise_for_status habitual.
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def build_search_url(location: str, term: str = "", page: int = 1) -> str:
     params = {"k": term.strip(), "l": location}
     if page > 1:
@@ -50,10 +112,21 @@ def set_page_param(url: str, page: int) -> str:
     return urlunparse(parsed._replace(query=urlencode(query)))
 
 
+PAGE_PLACEHOLDER = "__PAGE__"
+
+
+def page_url_template(url: str) -> str:
+    """URL com `p=__PAGE__`: a paginação só troca o número, sem voltar a fazer parse da query."""
+    parsed = urlparse(url)
+    query = dict(parse_qsl(parsed.query, keep_blank_values=True))
+    query["p"] = PAGE_PLACEHOLDER
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
 def _extract_total_pages(html: str) -> int | None:
     # fallback por links de paginação
     max_page = 1
-    for m in re.findall(r"[?&]p=(\d+)", html):
+    for m in _PAGE_RE.findall(html):
         try:
             max_page = max(max_page, int(m))
         except Exception:
@@ -62,6 +135,10 @@ def _extract_total_pages(html: str) -> int | None:
 
 
 def _is_job_detail_url(url: str) -> bool:
+    # URLs ASCII imprimíveis, sem espaço inicial nem "[" (o caso normal), ficam decididos
+    # só pelo regex; o resto (que o urlparse limpa ou rejeita) segue pelo caminho antigo.
+    if url.isascii() and url.isprintable() and url[:1] != " " and "[" not in url and "]" not in url:
+        return _JOB_DETAIL_RE.match(url) is not None
     try:
         parsed = urlparse(url)
     except Exception:
@@ -82,10 +159,17 @@ EN_HINTS = {"with", "for", "you", "team", "experience", "job", "position", "skil
 DE_HINTS = {"mit", "für", "sie", "erfahrung", "stelle", "aufgaben", "kenntnisse", "arbeit", "deutsch"}
 IT_HINTS = {"con", "per", "lavoro", "posizione", "esperienza", "richiesto", "competenze", "squadra"}
 
+# Base das assinaturas das decisões de idioma: mudar um dos hints invalida as decisões guardadas.
+_LANG_HASH_BASE = hashlib.blake2b(
+    "|".join(" ".join(sorted(hints)) for hints in (FR_HINTS, EN_HINTS, DE_HINTS, IT_HINTS)).encode("utf-8"),
+    digest_size=12,
+)
+
 
 def _is_allowed_language(title: str | None, description: str | None) -> bool:
     text = f"{title or ''} {description or ''}".lower()
-    tokens = set(re.findall(r"[a-zàâçéèêëîïôûùüÿñæœ]{3,}", text))
+    # Os hints têm todos 3+ letras, por isso os pedaços curtos do split nunca contam.
+    tokens = set(text.translate(_ASCII_SEPARATORS).split()) if text.isascii() else set(_TOKEN_RE.findall(text))
     fr = len(tokens & FR_HINTS)
     en = len(tokens & EN_HINTS)
     de = len(tokens & DE_HINTS)
@@ -95,13 +179,76 @@ def _is_allowed_language(title: str | None, description: str | None) -> bool:
     return (fr >= 2 or en >= 2) and max(fr, en) >= max(de, it)
 
 
+def _drain_hrefs(parser):
+    for event, el in parser.read_events():
+        if event == "start":
+            if el.tag == "a":
+                yield el.get("href")
+            continue
+        # Elemento fechado: já não é preciso. Limpa-o e solta os irmãos anteriores, para
+        # a árvore do pull parser ficar com pouco mais do que o caminho aberto até ao nó atual.
+        el.clear()
+        parent = el.getparent()
+        if parent is not None:
+            while el.getprevious() is not None:
+                del parent[0]
+
+
+def _iter_hrefs_streaming(html: str, chunk_size: int = 65536):
+    # Os blocos limitam quanto da árvore existe entre duas leituras de eventos:
+    # alimentar a página toda de uma vez construiria o DOM inteiro antes do primeiro href.
+    parser = lxml_etree.HTMLPullParser(events=("start", "end"))
+    for start in range(0, len(html), chunk_size):
+        parser.feed(html[start : start + chunk_size])
+        yield from _drain_hrefs(parser)
+    parser.close()
+    yield from _drain_hrefs(parser)
+
+
+def _iter_hrefs(html: str):
+    if FastHTMLParser is not None:
+        for node in FastHTMLParser(html).css("a[href]"):
+            yield node.attributes.get("href")
+        return
+    if lxml_etree is not None:
+        yield from _iter_hrefs_streaming(html)
+        return
+    for link in BeautifulSoup(html, HTML_PARSER, parse_only=_A_STRAINER).select("a[href]"):
+        yield link.get("href")
+
+
+def _language_signature(title: str | None, description: str | None) -> str:
+    h = _LANG_HASH_BASE.copy()
+    h.update((title or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update((description or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+def _row_language_ok(row: dict, url: str, decisions: dict[str, list] | None = None) -> bool:
+    """
+    `decisions` ({url: [assinatura, ok]}) vem do state: se o título, a descrição e os hints
+    não mudaram desde a última execução, reaproveita a decisão sem voltar a tokenizar.
+    """
+    title = row.get("title")
+    description = row.get("description")
+    if decisions is None:
+        return _is_allowed_language(title, description)
+    signature = _language_signature(title, description)
+    cached = decisions.get(url)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    ok = _is_allowed_language(title, description)
+    decisions[url] = [signature, ok]
+    return ok
+
+
 def extract_detail_links(html: str) -> list[str]:
-    soup = BeautifulSoup(html, "html.parser")
     out: list[str] = []
     seen: set[str] = set()
 
-    for link in soup.select("a[href]"):
-        href = (link.get("href") or "").strip()
+    for href in _iter_hrefs(html):
+        href = (href or "").strip()
         if not href:
             continue
         full = urljoin(f"https://{DETAIL_HOST}", href).split("#")[0]
@@ -109,6 +256,7 @@ def extract_detail_links(html: str) -> list[str]:
             continue
         if full in seen:
             continue
+        full = sys.intern(full)
         seen.add(full)
         out.append(full)
     return out
@@ -118,71 +266,136 @@ def _clean_text(value: str | None, limit: int = 1600) -> str | None:
     if not value:
         return None
     value = unescape(value)
-    value = re.sub(r"\s+", " ", value).strip()
+    value = _WS_RE.sub(" ", value).strip()
     if not value:
         return None
     return value[:limit]
 
 
-def _collect_nodes(obj: object) -> list[dict]:
-    out: list[dict] = []
-    if isinstance(obj, dict):
-        out.append(obj)
-        for v in obj.values():
-            out.extend(_collect_nodes(v))
-    elif isinstance(obj, list):
-        for it in obj:
-            out.extend(_collect_nodes(it))
-    return out
+def _find_jobposting(payload: object) -> dict | None:
+    # Percurso em pré-ordem com pilha explícita (filhos por ordem inversa): devolve o mesmo
+    # primeiro JobPosting que a recolha recursiva, mas pára logo que o encontra.
+    stack = [payload]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            if str(obj.get("@type") or "").lower() == "jobposting":
+                return obj
+            stack.extend(reversed(obj.values()))
+        elif isinstance(obj, list):
+            stack.extend(reversed(obj))
+    return None
+
+
+def _iter_ldjson_scripts(html: str | bytes):
+    if FastHTMLParser is not None:
+        for node in FastHTMLParser(html).css('script[type="application/ld+json"]'):
+            yield node.text()
+        return
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=_LD_STRAINER)
+    for script in soup.select('script[type="application/ld+json"]'):
+        yield script.string or script.get_text()
 
 
-def _extract_jobposting_ldjson(html: str) -> dict:
-    soup = BeautifulSoup(html, "html.parser")
-    for script in soup.select('script[type="application/ld+json"]'):
-        raw = (script.string or script.get_text() or "").strip()
+def _jobposting_fields(node: dict) -> dict:
+    company = None
+    org = node.get("hiringOrganization")
+    if isinstance(org, dict):
+        company = org.get("name")
+
+    location = None
+    loc = node.get("jobLocation")
+    if isinstance(loc, dict):
+        addr = loc.get("address")
+        if isinstance(addr, dict):
+            location = addr.get("addressLocality") or addr.get("addressRegion")
+
+    posting_date = str(node.get("datePosted") or "").strip() or None
+    if posting_date and "T" in posting_date:
+        posting_date = posting_date.split("T", 1)[0]
+
+    return {
+        "title": _clean_text(node.get("title"), 180),
+        "company": _clean_text(company, 160),
+        "location": _clean_text(location, 120),
+        "description": _clean_text(node.get("description"), 3500),
+        "posting_date": posting_date,
+    }
+
+
+def _extract_jobposting_ldjson(html: str | bytes) -> dict:
+    for raw in _iter_ldjson_scripts(html):
+        raw = (raw or "").strip()
         if not raw:
             continue
         try:
-            payload = json.loads(raw)
+            payload = _loads_json(raw)
         except Exception:
             continue
 
-        for node in _collect_nodes(payload):
-            if str(node.get("@type") or "").lower() != "jobposting":
-                continue
-
-            company = None
-            org = node.get("hiringOrganization")
-            if isinstance(org, dict):
-                company = org.get("name")
-
-            location = None
-            loc = node.get("jobLocation")
-            if isinstance(loc, dict):
-                addr = loc.get("address")
-                if isinstance(addr, dict):
-                    location = addr.get("addressLocality") or addr.get("addressRegion")
-
-            posting_date = str(node.get("datePosted") or "").strip() or None
-            if posting_date and "T" in posting_date:
-                posting_date = posting_date.split("T", 1)[0]
-
-            return {
-                "title": _clean_text(node.get("title"), 180),
-                "company": _clean_text(company, 160),
-                "location": _clean_text(location, 120),
-                "description": _clean_text(node.get("description"), 3500),
-                "posting_date": posting_date,
-            }
+        node = _find_jobposting(payload)
+        if node is not None:
+            return _jobposting_fields(node)
     return {}
 
 
-def fetch_detail(session: requests.Session, url: str, timeout: int = 30) -> dict:
-    r = session.get(url, timeout=timeout)
-    r.raise_for_status()
-    html = r.text
+def _extract_jobposting_ldjson_fast(content: bytes) -> dict | None:
+    """
+    Procura os blocos ld+json diretamente nos bytes da resposta, sem parser HTML nem decode.
+    Devolve None quando nenhum bloco foi descodificado (o regex não casou, ou o conteúdo
+    precisa do parser HTML, p.ex. entidades ou CDATA), para o chamador usar o parser;
+    {} só quando houve blocos válidos mas nenhum JobPosting.
+    """
+    decoded = False
+    for match in _LDJSON_RE.finditer(content):
+        raw = match.group(1).strip()
+        if not raw:
+            continue
+        try:
+            payload = _loads_json(raw)
+        except Exception:
+            continue
 
-    ld = _extract_jobposting_ldjson(html)
+        decoded = True
+        node = _find_jobposting(payload)
+        if node is not None:
+            return _jobposting_fields(node)
+    return {} if decoded else None
+
+
+def fetch_detail(
+    session: requests.Session,
+    url: str,
+    timeout: int = 30,
+    validators: dict[str, list] | None = None,
+) -> dict | None:
+    """
+    Com `validators` ({url: [etag, last_modified]}) faz um GET condicional e devolve None
+    quando a página não mudou (304). O dict é atualizado com os validadores da resposta.
+    """
+    headers: dict[str, str] = {}
+    if validators is not None:
+        etag, last_modified = validators.get(url) or (None, None)
+        if etag:
+            headers["If-None-Match"] = str(etag)
+        if last_modified:
+            headers["If-Modified-Since"] = str(last_modified)
+    r = session.get(url, timeout=timeout, headers=headers)
+    if r.status_code == 304:
+        return None
+    r.raise_for_status()
+    if validators is not None:
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        if etag or last_modified:
+            validators[url] = [etag, last_modified]
+
+    # Só bytes: o r.text (deteção de charset + decode da página inteira) nunca é pedido.
+    # O parser do fallback recebe os bytes e decide a codificação pelo próprio HTML.
+    content = r.content
+    ld = _extract_jobposting_ldjson_fast(content)
+    if ld is None:
+        ld = _extract_jobposting_ldjson(content)
 
     return {
         "title": ld.get("title"),
@@ -195,6 +408,43 @@ def fetch_detail(session: requests.Session, url: str, timeout: int = 30) -> dict
     }
 
 
+class RateLimiter:
+    """Garante um intervalo mínimo entre pedidos, partilhado entre threads."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = max(0.0, interval)
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_at)
+            self._next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+# Resposta 304 de um link já descartado numa execução anterior.
+NOT_MODIFIED: dict = {}
+
+
+def _fetch_detail_safe(
+    session: requests.Session,
+    url: str,
+    limiter: RateLimiter,
+    validators: dict[str, list],
+) -> dict | None:
+    limiter.wait()
+    try:
+        job = fetch_detail(session, url, validators=validators)
+    except Exception:
+        return None
+    return NOT_MODIFIED if job is None else job
+
+
 def within_days(posting_date: str | None, max_days: int | None) -> bool:
     if max_days is None:
         return True
@@ -208,10 +458,42 @@ def within_days(posting_date: str | None, max_days: int | None) -> bool:
     return 0 <= age <= max_days
 
 
-def save_json(path: str, rows: list[dict]) -> None:
-    p = Path(path)
+def _loads_json(raw: bytes | str):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps_json(payload: object, trailing_newline: bool = False) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        if trailing_newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(payload, option=option)
+    text = json.dumps(payload, ensure_ascii=False, indent=2)
+    return (text + "\n" if trailing_newline else text).encode("utf-8")
+
+
+def _write_atomic(p: Path, data: bytes) -> None:
+    # Escreve ao lado e troca com os.replace: o ficheiro nunca fica meio escrito.
     p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(rows, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    tmp = p.with_name(f"{p.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, p)
+
+
+def save_json(path: str, rows: list[dict], previous_digest: str | None = None) -> tuple[str, bool]:
+    """
+    Grava o JSON de forma atómica e devolve (digest, escrito).
+    Quando o digest coincide com o da execução anterior e o ficheiro existe, não reescreve.
+    """
+    p = Path(path)
+    data = _dumps_json(rows, trailing_newline=True)
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    if previous_digest == digest and p.exists():
+        return digest, False
+    _write_atomic(p, data)
+    return digest, True
 
 
 def save_csv(path: str, jobs: list[dict]) -> None:
@@ -219,10 +501,9 @@ def save_csv(path: str, jobs: list[dict]) -> None:
     p = Path(path)
     p.parent.mkdir(parents=True, exist_ok=True)
     with p.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        for job in jobs:
-            writer.writerow({k: job.get(k) for k in fields})
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        writer.writerows([job.get(k) for k in fields] for job in jobs)
 
 
 def load_json_jobs(path: str) -> list[dict]:
@@ -230,7 +511,7 @@ def load_json_jobs(path: str) -> list[dict]:
     if not p.exists():
         return []
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        data = _loads_json(p.read_bytes())
     except Exception:
         return []
     if not isinstance(data, list):
@@ -239,11 +520,18 @@ def load_json_jobs(path: str) -> list[dict]:
 
 
 def load_state(path: str) -> dict:
+    """Lê o state (gzip quando o caminho acaba em .gz); sem .gz ainda, aceita o .json antigo."""
     p = Path(path)
+    compressed = p.suffix == ".gz"
+    if compressed and not p.exists():
+        legacy = p.with_suffix("")
+        if legacy.exists():
+            p, compressed = legacy, False
     if not p.exists():
         return {}
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
+        raw = p.read_bytes()
+        data = _loads_json(gzip.decompress(raw) if compressed else raw)
     except Exception:
         return {}
     return data if isinstance(data, dict) else {}
@@ -251,11 +539,27 @@ def load_state(path: str) -> dict:
 
 def save_state(path: str, payload: dict) -> None:
     p = Path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    data = _dumps_json(payload)
+    if p.suffix == ".gz":
+        # mtime=0: o mesmo state gera sempre os mesmos bytes.
+        _write_atomic(p, gzip.compress(data, compresslevel=6, mtime=0))
+        # O .json antigo já foi migrado; deixá-lo ficar só confundiria a próxima leitura manual.
+        p.with_suffix("").unlink(missing_ok=True)
+    else:
+        _write_atomic(p, data)
 
 
-def merge_jobs_by_url(current: list[dict], fresh: list[dict], filter_lang: bool = True) -> list[dict]:
+def _job_urls(rows: list[dict]) -> frozenset[str]:
+    # Uma passagem só: cada URL é normalizada e internada uma vez.
+    return frozenset(map(sys.intern, filter(None, (str(row.get("url") or "").strip() for row in rows))))
+
+
+def merge_jobs_by_url(
+    current: list[dict],
+    fresh: list[dict],
+    filter_lang: bool = True,
+    lang_decisions: dict[str, list] | None = None,
+) -> list[dict]:
     merged: dict[str, dict] = {}
     max_id = 0
 
@@ -265,19 +569,26 @@ def merge_jobs_by_url(current: list[dict], fresh: list[dict], filter_lang: bool
             max_id = raw_id
 
     for row in current:
+        # Versões anteriores guardavam a decisão de idioma no próprio registo.
+        row.pop("_lang_ok", None)
         url = str(row.get("url") or "").strip()
         if not url:
             continue
-        if filter_lang and not _is_allowed_language(row.get("title"), row.get("description")):
+        if filter_lang and not _row_language_ok(row, url, lang_decisions):
             continue
+        # Chave do dict e campo do registo passam a ser o mesmo objeto.
+        url = sys.intern(url)
+        row["url"] = url
         merged[url] = row
 
     for row in fresh:
         url = str(row.get("url") or "").strip()
         if not url:
             continue
-        if filter_lang and not _is_allowed_language(row.get("title"), row.get("description")):
+        if filter_lang and not _row_language_ok(row, url, lang_decisions):
             continue
+        url = sys.intern(url)
+        row["url"] = url
         existing = merged.get(url)
         if existing and isinstance(existing.get("id"), int):
             row["id"] = existing["id"]
@@ -293,7 +604,8 @@ def merge_jobs_by_url(current: list[dict], fresh: list[dict], filter_lang: bool
             row["id"] = max_id
 
     out = list(merged.values())
-    out.sort(key=lambda r: int(r.get("id")) if isinstance(r.get("id"), int) else 0, reverse=True)
+    # O ciclo anterior garante um id inteiro em todas as linhas.
+    out.sort(key=itemgetter("id"), reverse=True)
     return out
 
 
@@ -324,18 +636,21 @@ def main() -> None:
         help="Não filtra idioma (por omissão, mantém apenas vagas em francês/inglês).",
     )
     parser.add_argument("--save-csv", action="store_true", help="Também salva CSV")
+    parser.add_argument("--workers", type=int, default=8, help="Pedidos de detalhe em paralelo")
     args = parser.parse_args()
 
     output_json = args.output_json.strip() or str(Path("data") / "talent" / "professions.json")
     output_path = Path(output_json)
-    auto_state_file = str(output_path.with_name(f"{output_path.stem}.state.json"))
+    auto_state_file = str(output_path.with_name(f"{output_path.stem}.state.json.gz"))
 
     existing_jobs = load_json_jobs(output_json)
-    known_urls = {str(j.get("url") or "").strip() for j in existing_jobs if str(j.get("url") or "").strip()}
+    existing_urls = _job_urls(existing_jobs)
     auto_state = load_state(auto_state_file)
     state_urls = auto_state.get("seen_urls") if isinstance(auto_state, dict) else []
-    if isinstance(state_urls, list):
-        known_urls.update(str(x).strip() for x in state_urls if str(x).strip())
+    if not isinstance(state_urls, list):
+        state_urls = []
+    state_known = frozenset(map(sys.intern, filter(None, (str(x).strip() for x in state_urls))))
+    known_urls = existing_urls | state_known
 
     if known_urls:
         print(
@@ -343,8 +658,7 @@ def main() -> None:
             f"(dados + estado: {auto_state_file})"
         )
 
-    session = requests.Session()
-    session.headers.update(DEFAULT_HEADERS)
+    session = build_session(pool_size=max(8, args.workers))
 
     page1_url = args.url.strip() or build_search_url(location=args.location, term=args.term, page=1)
     print(f"[SEARCH] Página base: {page1_url}")
@@ -374,9 +688,10 @@ def main() -> None:
 
     max_dyn = total_pages if total_pages else 200
     page_iter = range(2, max_dyn + 1)
+    page_template = page_url_template(page1_url)
 
     for page in page_iter:
-        page_url = set_page_param(page1_url, page)
+        page_url = page_template.replace(PAGE_PLACEHOLDER, str(page))
         pr = session.get(page_url, timeout=30)
         pr.raise_for_status()
         page_links = extract_detail_links(pr.text)
@@ -418,39 +733,57 @@ def main() -> None:
 
     fresh_jobs: list[dict] = []
     max_days = args.days if args.days and args.days > 0 else None
+    filter_lang = not args.allow_non_french
     fetch_errors = 0
     dropped_by_days = 0
+    unchanged = 0
+
+    # Os links que chegam aqui nunca foram persistidos: os validadores guardados são de páginas
+    # descartadas antes (janela/idioma). Com os mesmos filtros, um 304 seria descartado outra vez,
+    # por isso só valem se --days e o filtro de idioma não mudaram.
+    filters_key = [max_days, filter_lang]
+    raw_validators = auto_state.get("validators") if isinstance(auto_state, dict) else None
+    validators: dict[str, list] = {}
+    if isinstance(raw_validators, dict) and auto_state.get("validators_filters") == filters_key:
+        validators = {u: v for u, v in raw_validators.items() if isinstance(v, list) and len(v) == 2}
+
+    # A paginação continua em série (stop-after-seen); os detalhes são independentes.
+    # executor.map devolve pela ordem de detail_links, o que mantém os ids estáveis,
+    # e o --delay passa a ser o intervalo global entre pedidos.
+    limiter = RateLimiter(args.delay)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        details = executor.map(lambda link: _fetch_detail_safe(session, link, limiter, validators), detail_links)
+        for idx, job in enumerate(details, start=1):
+            if job is None:
+                fetch_errors += 1
+                continue
 
-    for idx, link in enumerate(detail_links, start=1):
-        try:
-            job = fetch_detail(session, link)
-        except Exception:
-            fetch_errors += 1
-            continue
-
-        if not within_days(job.get("posting_date"), max_days):
-            dropped_by_days += 1
-            continue
+            if job is NOT_MODIFIED:
+                unchanged += 1
+                continue
 
-        fresh_jobs.append(job)
-        if idx % 25 == 0:
-            print(f"  Detalhes processados: {idx}/{len(detail_links)}")
-        if args.delay > 0:
-            time.sleep(args.delay)
+            if not within_days(job.get("posting_date"), max_days):
+                dropped_by_days += 1
+                continue
 
-    filter_lang = not args.allow_non_french
-    before_merge_urls = {
-        str(j.get("url") or "").strip()
-        for j in existing_jobs
-        if str(j.get("url") or "").strip()
-    }
-    merged = merge_jobs_by_url(existing_jobs, fresh_jobs, filter_lang=filter_lang)
-    after_merge_urls = {
-        str(j.get("url") or "").strip()
-        for j in merged
-        if str(j.get("url") or "").strip()
-    }
-    added_after_filters = len(after_merge_urls - before_merge_urls)
+            fresh_jobs.append(job)
+            if idx % 25 == 0:
+                print(f"  Detalhes processados: {idx}/{len(detail_links)}")
+
+    raw_decisions = auto_state.get("lang_decisions") if isinstance(auto_state, dict) else None
+    lang_decisions: dict[str, list] = {}
+    if isinstance(raw_decisions, dict):
+        lang_decisions = {
+            u: v
+            for u, v in raw_decisions.items()
+            if isinstance(v, list) and len(v) == 2 and isinstance(v[1], bool)
+        }
+    merged = merge_jobs_by_url(existing_jobs, fresh_jobs, filter_lang=filter_lang, lang_decisions=lang_decisions)
+    # Guarda no state apenas URLs realmente persistidas, para nao "queimar"
+    # links novos quando o detalhe falha ou o registo e descartado temporariamente.
+    # merge_jobs_by_url já deixa em cada linha a URL-chave normalizada e internada.
+    seen_now = frozenset(map(itemgetter("url"), merged))
+    added_after_filters = len(seen_now - existing_urls)
     dropped_by_language = max(len(fresh_jobs) - added_after_filters, 0) if filter_lang else 0
 
     print(
@@ -458,30 +791,42 @@ def main() -> None:
         f"ok={len(fresh_jobs)} | "
         f"erros={fetch_errors} | "
         f"fora_janela={dropped_by_days} | "
-        f"idioma={dropped_by_language}"
+        f"idioma={dropped_by_language} | "
+        f"sem_alteracoes={unchanged}"
     )
 
-    # Guarda no state apenas URLs realmente persistidas, para nao "queimar"
-    # links novos quando o detalhe falha ou o registo e descartado temporariamente.
-    seen_now = {
-        str(j.get("url") or "").strip() for j in merged if str(j.get("url") or "").strip()
-    }
+    # O JSON vai primeiro: o state nunca lista URLs que ainda não estão nos dados.
+    previous_digest = auto_state.get("output_digest") if isinstance(auto_state, dict) else None
+    output_digest, written = save_json(output_json, merged, previous_digest=previous_digest)
+    if written:
+        print(f"[SAVE] JSON salvo: {output_json} ({len(merged)} vagas)")
+    else:
+        print(f"[SAVE] JSON sem alterações: {output_json} ({len(merged)} vagas)")
+
+    # Execução sem novidades: a lista gravada da última vez já está ordenada, não se reordena.
+    if seen_now == state_known and len(state_urls) == len(seen_now):
+        seen_urls = state_urls
+    else:
+        seen_urls = sorted(seen_now)
 
     save_state(
         auto_state_file,
         {
             "last_run_at": datetime.now().isoformat(timespec="seconds"),
-            "seen_urls": sorted(seen_now),
+            "seen_urls": seen_urls,
             "output_json": output_json,
+            "output_digest": output_digest,
+            # Só links vistos nesta execução e não persistidos: os outros nunca voltam ao detalhe.
+            "validators": {u: validators[u] for u in seen_links if u in validators and u not in seen_now},
+            "validators_filters": filters_key,
+            # Decisões de idioma das vagas persistidas, com a assinatura do texto que as gerou.
+            "lang_decisions": {u: lang_decisions[u] for u in seen_now if u in lang_decisions},
         },
     )
     print(f"[SAVE] Estado incremental salvo: {auto_state_file} ({len(seen_now)} URLs)")
 
-    save_json(output_json, merged)
-    print(f"[SAVE] JSON salvo: {output_json} ({len(merged)} vagas)")
-
     if args.save_csv:
-        csv_name = re.sub(r"\.json$", ".csv", output_json, flags=re.IGNORECASE)
+        csv_name = _JSON_EXT_RE.sub(".csv", output_json)
         if csv_name == output_json:
             csv_name = f"{output_json}.csv"
         save_csv(csv_name, merged)